@@ -6,6 +6,7 @@ from google.adk.agents import Agent
 from google.adk.tools.mcp_tool.mcp_toolset import MCPToolset
 from google.adk.tools.mcp_tool.mcp_session_manager import StdioConnectionParams
 from mcp import StdioServerParameters
+from .emergency import emergency_fast_path
 
 # Asegura variables de entorno (GOOGLE_API_KEY, etc.)
 load_dotenv(find_dotenv())
@@ -121,6 +122,10 @@ root_agent = Agent(
                 •	Red Nacional de Refugios
 
 
+            9.1 Mensaje urgente automático
+                •	Si en esta conversación ya aparece el mensaje urgente R2 con la lista de contactos de emergencia (enviado automáticamente), no lo repitas: continúa con contención emocional (PASO 2) y pregunta con calma si puede ponerse a salvo.
+
+
             10. Estilo conversacional (T2)
                 •	Profesional, cálido, claro
                 •	Frases cortas, ritmo lento, enfoque en calma
@@ -153,6 +158,8 @@ root_agent = Agent(
                     
         '''
     ),
+    # Ruta rápida local ante peligro inmediato (R2 + contactos sin esperar al modelo)
+    before_model_callback=emergency_fast_path,
     tools=[
         MCPToolset(
             connection_params=StdioConnectionParams(
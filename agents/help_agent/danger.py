@@ -0,0 +1,34 @@
+"""
+Detección local (sin LLM ni ADK) de peligro inmediato en un mensaje.
+
+Solo construcciones en presente con un agresor actuando ahora ("me está
+golpeando", "tiene un arma", "está afuera de mi casa"); relatos pasados o
+palabras sueltas ("cuchillo", "auxilio") no disparan la ruta rápida.
+"""
+
+import re
+import unicodedata
+
+# Patrones sobre texto en minúsculas y sin acentos
+_DANGER_PATTERNS = [
+    r"\bme (esta|estan) (golpeando|pegando|ahorcando|estrangulando|lastimando|amenazando|persiguiendo)\b",
+    r"\b(me|nos) (quiere|quieren|va a|van a) (matar|golpear|pegar|ahorcar)\b",
+    r"\b(tiene|trae|esta sacando) (un|una) (arma|pistola|cuchillo|navaja|machete)\b",
+    r"\bme (amenaza|amenazan|esta amenazando|estan amenazando) con (matarme|un arma|una pistola|un cuchillo|una navaja)\b",
+    r"\bme (tiene|tienen) (encerrada|encerrado)\b",
+    r"\b(esta|estan) (afuera|fuera|en la puerta) de (mi|la) (casa|puerta|cuarto|departamento)\b",
+    r"\b(esta|estan) (pateando|forzando|tratando de abrir) (mi|la) puerta\b",
+    r"\b(socorro|ayudame ya|ayuda urgente)\b",
+    r"\bestoy sangrando\b",
+]
+_DANGER_RE = re.compile("|".join(f"(?:{p})" for p in _DANGER_PATTERNS))
+
+
+def _fold(text: str) -> str:
+    s = unicodedata.normalize("NFKD", (text or "").lower())
+    return "".join(ch for ch in s if not unicodedata.combining(ch))
+
+
+def detect_immediate_danger(text: str) -> bool:
+    """True si el texto tiene señales claras de peligro inmediato."""
+    return bool(text) and _DANGER_RE.search(_fold(text)) is not None
@@ -0,0 +1,74 @@
+"""
+Ruta rápida de emergencia (sin LLM) para el agente de apoyo.
+
+Antes de cada llamada al modelo revisa el último mensaje de la usuaria con
+patrones locales (danger.py). Si hay señales claras de peligro inmediato
+responde al instante con el mensaje R2 y los contactos de emergencia, y deja que el
+modelo continúe el turno (contención, siguientes pasos) a continuación.
+"""
+
+import logging
+from typing import Dict, List, Optional
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import LlmRequest, LlmResponse
+from google.genai import types
+
+from .danger import detect_immediate_danger
+
+logger = logging.getLogger("help_agent.emergency")
+
+R2_MESSAGE = (
+    "Tu seguridad es lo más importante. Si puedes hacerlo sin ponerte en mayor riesgo, "
+    "por favor busca un lugar seguro y contacta al 911 ahora mismo. Estoy contigo aquí."
+)
+CONTACTS_TOOL = "get_emergency_contacts"
+
+try:
+    # Mismo KB que usa el MCP; se importa sin BD ni servidor
+    from mcp_servers.help_mcp_server.kb import FALLBACK_CONTACTS, build_default_index
+
+    _CONTACTS: List[Dict[str, str]] = build_default_index().contacts("MX") or list(FALLBACK_CONTACTS)
+except Exception as e:  # depende del PYTHONPATH del proceso
+    logger.warning("KB de protocolos no disponible para la ruta rápida: %s", e)
+    _CONTACTS = [{"name": "Emergencias", "phone": "911", "url": "https://www.gob.mx/911"}]
+
+
+def urgent_reply() -> str:
+    lines = [R2_MESSAGE, "", "Contactos de emergencia:"]
+    for c in _CONTACTS:
+        phone = c.get("phone") or ""
+        lines.append(f"- {c.get('name')}: {phone}" if phone and phone != "—" else f"- {c.get('name')}")
+    return "\n".join(lines)
+
+
+def _latest_user_text(llm_request: LlmRequest) -> Optional[str]:
+    # Solo en la primera llamada del turno: el último contenido es texto de la usuaria
+    # (tras una tool el último contenido es function_response y no se dispara de nuevo)
+    if not llm_request.contents:
+        return None
+    last = llm_request.contents[-1]
+    if last.role != "user" or not last.parts:
+        return None
+    if any(p.function_response for p in last.parts):
+        return None
+    return " ".join(p.text for p in last.parts if p.text) or None
+
+
+def emergency_fast_path(
+    callback_context: CallbackContext, llm_request: LlmRequest
+) -> Optional[LlmResponse]:
+    """before_model_callback: responde sin LLM ante peligro inmediato."""
+    text = _latest_user_text(llm_request)
+    if not text or not detect_immediate_danger(text):
+        return None
+
+    logger.info("Ruta rápida de emergencia activada (invocation=%s)", callback_context.invocation_id)
+    callback_context.state["emergency_fast_path"] = True
+    parts = [types.Part(text=urgent_reply())]
+    # Si el MCP expone la tool de contactos, se encadena la llamada para que ADK
+    # ejecute la tool y vuelva a invocar al modelo: el turno completo continúa
+    # después de haber mostrado ya el mensaje urgente.
+    if CONTACTS_TOOL in (llm_request.tools_dict or {}):
+        parts.append(types.Part(function_call=types.FunctionCall(name=CONTACTS_TOOL, args={"country": "MX"})))
+    return LlmResponse(content=types.Content(role="model", parts=parts))
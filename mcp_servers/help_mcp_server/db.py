@@ -3,6 +3,8 @@ from urllib.parse import quote_plus
 import psycopg2
 from pgvector.psycopg2 import register_vector
 from dotenv import load_dotenv, find_dotenv
+from tools.db_router import DbRouter
+from tools.db_statements import StatementRegistry
 
 load_dotenv(find_dotenv())
 
@@ -31,6 +33,20 @@ def db():
             cur.execute("SET search_path TO %s, public", (HELP_DB_SCHEMA,))
         return conn
 
+def _setup(conn):
+        register_vector(conn)
+        with conn.cursor() as cur:
+            cur.execute("SET search_path TO %s, public", (HELP_DB_SCHEMA,))
+
+# Réplicas de lectura: HELP_DB_REPLICA_DSNS, o las generales si HELP comparte DB_DSN
+_REPLICAS = os.getenv("HELP_DB_REPLICA_DSNS", "").strip() or (
+        "" if os.getenv("HELP_DB_DSN", "").strip() else os.getenv("DB_REPLICA_DSNS", "")
+)
+# Pool compartido por las tools (search_help y recursos son solo lectura)
+ROUTER = DbRouter.from_env(DB_DSN, _REPLICAS, prefix="HELP_DB_", setup=_setup)
+# Sentencias preparadas por conexión del pool + conteo/tiempos (recurso stats://db)
+STATEMENTS = StatementRegistry()
+
 def ensure_schema_and_tables():
         """Crea schema y tablas si no existen (requiere permisos)."""
         schema = HELP_DB_SCHEMA
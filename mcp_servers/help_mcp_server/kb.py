@@ -0,0 +1,235 @@
+"""
+KB de protocolos (carga desde archivo + índice en memoria).
+
+- Los protocolos viven en data/protocols.json (o HELP_PROTOCOLS_FILE).
+- Se indexan una sola vez en un índice invertido con tokens sin acentos
+  y se puntúan con BM25 (título con más peso que tags y pasos).
+- Opcional: embeddings precalculados (HELP_PROTOCOL_EMBEDDINGS_FILE,
+  JSON {id: [floats]}) para combinar similitud semántica.
+
+Este módulo no depende de la BD ni de FastMCP para poder importarse
+desde otros procesos (p. ej. el agente) sin costo.
+"""
+
+import bisect
+import json
+import logging
+import math
+import os
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("help_mcp.kb")
+
+_BASE_DIR = Path(__file__).resolve().parent
+PROTOCOLS_FILE = os.getenv("HELP_PROTOCOLS_FILE") or str(_BASE_DIR / "data" / "protocols.json")
+PROTOCOL_EMBEDDINGS_FILE = os.getenv("HELP_PROTOCOL_EMBEDDINGS_FILE") or str(
+    _BASE_DIR / "data" / "protocol_embeddings.json"
+)
+
+# Si el KB no carga, al menos se devuelve el 911
+FALLBACK_CONTACTS: List[Dict[str, str]] = [
+    {"name": "Emergencias", "phone": "911", "url": "https://www.gob.mx/911"},
+]
+
+# Pesos por campo (BM25F simplificado) y parámetros BM25
+FIELD_WEIGHTS = {"title": 2.0, "tags": 1.0, "steps": 0.5}
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Prefijo mínimo para expandir un token de la consulta ("denun" → "denuncia", "denunciar")
+MIN_PREFIX = 4
+
+_STOPWORDS = frozenset(
+    "a al con de del el en la las lo los mi me mis o para por que se si su sus te tu un una y".split()
+)
+_TOKEN_RE = re.compile(r"[a-z0-9ñ*]+")
+
+
+@dataclass
+class Protocol:
+    id: str
+    title: str
+    country: str
+    tags: List[str]
+    steps: List[str]
+    contacts: List[Dict[str, str]]  # {name, phone, url}
+    state: str = ""
+
+
+def fold(text: str) -> str:
+    """Minúsculas sin acentos (conserva la ñ)."""
+    s = (text or "").lower().replace("ñ", "\x00")
+    s = unicodedata.normalize("NFKD", s)
+    s = "".join(ch for ch in s if not unicodedata.combining(ch))
+    return s.replace("\x00", "ñ")
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(fold(text)) if t not in _STOPWORDS]
+
+
+def load_protocols(path: str = PROTOCOLS_FILE) -> List[Protocol]:
+    with open(path, "r", encoding="utf-8") as f:
+        raw = json.load(f) or []
+    out: List[Protocol] = []
+    for p in raw:
+        out.append(Protocol(
+            id=str(p["id"]),
+            title=p.get("title", ""),
+            country=(p.get("country") or "MX").upper(),
+            tags=list(p.get("tags") or []),
+            steps=list(p.get("steps") or []),
+            contacts=list(p.get("contacts") or []),
+            state=p.get("state") or "",
+        ))
+    return out
+
+
+@dataclass
+class ProtocolIndex:
+    """Índice invertido BM25 sobre el KB; se construye una vez y es de solo lectura."""
+    protocols: List[Protocol]
+    by_id: Dict[str, Protocol] = field(default_factory=dict)
+    postings: Dict[str, List[Tuple[int, float]]] = field(default_factory=dict)
+    idf: Dict[str, float] = field(default_factory=dict)
+    vocab: List[str] = field(default_factory=list)
+    doc_len: List[float] = field(default_factory=list)
+    avg_len: float = 0.0
+    country_n: List[str] = field(default_factory=list)
+    state_n: List[str] = field(default_factory=list)
+    contacts_by_country: Dict[str, List[Dict[str, str]]] = field(default_factory=dict)
+    embeddings: Any = None  # np.ndarray (n, d) normalizado, o None
+
+    @classmethod
+    def build(cls, protocols: List[Protocol]) -> "ProtocolIndex":
+        idx = cls(protocols=list(protocols))
+        tf_by_term: Dict[str, List[Tuple[int, float]]] = {}
+        for i, p in enumerate(idx.protocols):
+            idx.by_id[p.id] = p
+            idx.country_n.append(p.country.upper())
+            idx.state_n.append(fold(p.state))
+            tf: Dict[str, float] = {}
+            fields = {"title": p.title, "tags": " ".join(p.tags), "steps": " ".join(p.steps)}
+            for name, text in fields.items():
+                w = FIELD_WEIGHTS[name]
+                for tok in tokenize(text):
+                    tf[tok] = tf.get(tok, 0.0) + w
+            idx.doc_len.append(sum(tf.values()))
+            for tok, f in tf.items():
+                tf_by_term.setdefault(tok, []).append((i, f))
+
+        n = len(idx.protocols)
+        idx.avg_len = (sum(idx.doc_len) / n) if n else 0.0
+        idx.postings = tf_by_term
+        idx.idf = {
+            t: math.log(1.0 + (n - len(ps) + 0.5) / (len(ps) + 0.5))
+            for t, ps in tf_by_term.items()
+        }
+        idx.vocab = sorted(tf_by_term)
+
+        # contactos deduplicados por (name, phone) y país
+        for p in idx.protocols:
+            bucket = idx.contacts_by_country.setdefault(p.country.upper(), [])
+            seen = {(c.get("name"), c.get("phone")) for c in bucket}
+            for c in p.contacts:
+                key = (c.get("name"), c.get("phone"))
+                if key not in seen:
+                    bucket.append(c)
+                    seen.add(key)
+        return idx
+
+    def attach_embeddings(self, path: str = PROTOCOL_EMBEDDINGS_FILE) -> bool:
+        """Carga embeddings precalculados {id: [floats]} si existen."""
+        if not os.path.exists(path):
+            return False
+        import numpy as np
+
+        with open(path, "r", encoding="utf-8") as f:
+            raw = json.load(f) or {}
+        dim = len(next(iter(raw.values()), []))
+        if not dim:
+            return False
+        mat = np.zeros((len(self.protocols), dim), dtype=np.float32)
+        for i, p in enumerate(self.protocols):
+            vec = raw.get(p.id)
+            if vec and len(vec) == dim:
+                mat[i] = vec
+        norms = np.linalg.norm(mat, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self.embeddings = mat / norms
+        return True
+
+    def _expand(self, token: str) -> List[str]:
+        if token in self.postings or len(token) < MIN_PREFIX:
+            return [token] if token in self.postings else []
+        lo = bisect.bisect_left(self.vocab, token)
+        out: List[str] = []
+        while lo < len(self.vocab) and self.vocab[lo].startswith(token):
+            out.append(self.vocab[lo])
+            lo += 1
+        return out
+
+    def contacts(self, country: str = "MX") -> List[Dict[str, str]]:
+        return list(self.contacts_by_country.get((country or "").upper(), []))
+
+    def search(
+        self,
+        query: str,
+        country: str = "",
+        state: str = "",
+        top_k: int = 3,
+        query_vec: Optional[List[float]] = None,
+        semantic_weight: float = 1.0,
+    ) -> List[Tuple[Protocol, float]]:
+        cc = (country or "").upper()
+        st = fold(state)
+
+        def allowed(i: int) -> bool:
+            if cc and self.country_n[i] != cc:
+                return False
+            # protocolos sin estado aplican a todo el país
+            return not st or not self.state_n[i] or self.state_n[i] == st
+
+        scores: Dict[int, float] = {}
+        for tok in set(tokenize(query)):
+            for term in self._expand(tok):
+                idf = self.idf[term]
+                for i, f in self.postings[term]:
+                    if not allowed(i):
+                        continue
+                    norm = 1.0 - BM25_B + BM25_B * (self.doc_len[i] / self.avg_len if self.avg_len else 1.0)
+                    scores[i] = scores.get(i, 0.0) + idf * f * (BM25_K1 + 1.0) / (f + BM25_K1 * norm)
+
+        if query_vec is not None and self.embeddings is not None:
+            import numpy as np
+
+            q = np.asarray(query_vec, dtype=np.float32)
+            qn = float(np.linalg.norm(q)) or 1.0
+            sims = self.embeddings @ (q / qn)
+            for i in range(len(self.protocols)):
+                if allowed(i) and sims[i] > 0:
+                    scores[i] = scores.get(i, 0.0) + semantic_weight * float(sims[i])
+
+        if not scores and not (query or "").strip():
+            # consulta vacía: lista el KB del país
+            return [(self.protocols[i], 0.0) for i in range(len(self.protocols)) if allowed(i)][: max(1, top_k)]
+
+        ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+        return [(self.protocols[i], s) for i, s in ranked[: max(1, top_k)]]
+
+
+def build_default_index() -> ProtocolIndex:
+    try:
+        protocols = load_protocols(PROTOCOLS_FILE)
+    except Exception as e:
+        logger.warning("No se pudo cargar el KB de protocolos %s: %s", PROTOCOLS_FILE, e)
+        protocols = []
+    idx = ProtocolIndex.build(protocols)
+    try:
+        idx.attach_embeddings(PROTOCOL_EMBEDDINGS_FILE)
+    except Exception as e:
+        logger.warning("Embeddings de protocolos no disponibles: %s", e)
+    return idx
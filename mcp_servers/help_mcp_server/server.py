@@ -5,7 +5,8 @@ Provee herramientas para:
   - Obtener contactos de emergencia y líneas de ayuda.
   - Sugerir un plan de seguridad personalizado.
 
-Nota: Este servidor no requiere base de datos. Usa un KB mínimo estático.
+Nota: los protocolos se cargan de data/protocols.json (ver kb.py); la BD solo se usa
+para el RAG de documentos (search_help).
 """
 
 from typing import List, Dict, Any, Optional
@@ -15,12 +16,17 @@ import os
 import json
 from pathlib import Path
 import unicodedata
+import logging
+import threading
+import time
 import psycopg2, psycopg2.extras
 from dotenv import load_dotenv, find_dotenv
 from tools.embed_client import embed_texts
-from .db import db, ensure_schema_and_tables, HELP_DB_SCHEMA
+from .db import ROUTER, STATEMENTS, ensure_schema_and_tables, HELP_DB_SCHEMA
+from .kb import FALLBACK_CONTACTS, build_default_index
 
 mcp = FastMCP("help-womens-mcp")
+logger = logging.getLogger("help_mcp")
 load_dotenv(find_dotenv())
 TOPK = int(os.getenv("RAG_TOPK", "5"))
 AUTO_INIT_SCHEMA = os.getenv("HELP_AUTO_INIT_SCHEMA", "true").lower() in ("1","true","yes")
@@ -30,81 +36,17 @@ if AUTO_INIT_SCHEMA:
     except Exception:
         pass
 
-# ----------------------------- KB estático ---------------------------------
-
-@dataclass
-class Protocol:
-    id: str
-    title: str
-    country: str
-    tags: List[str]
-    steps: List[str]
-    contacts: List[Dict[str, str]]  # {name, phone, url}
-
-
-KB: List[Protocol] = [
-    Protocol(
-        id="emergencia-mx-001",
-        title="Emergencia inmediata (México)",
-        country="MX",
-        tags=["emergencia", "riesgo", "violencia"],
-        steps=[
-            "Si estás en peligro inminente, llama al 911 de inmediato.",
-            "Si no puedes hablar, intenta mantener la línea abierta o utiliza palabras clave para pedir ayuda.",
-            "De ser posible, mueve a menores o dependientes a un lugar seguro dentro de tu hogar (cerca de una salida).",
-            "Identifica una vecina o persona de confianza a quien puedas avisar con una palabra clave.",
-        ],
-        contacts=[
-            {"name": "Emergencias", "phone": "911", "url": "https://www.gob.mx/911"},
-            {"name": "Línea Mujeres (CDMX)", "phone": "*765", "url": "https://www.semujeres.cdmx.gob.mx/"},
-        ],
-    ),
-    Protocol(
-        id="denuncia-mx-001",
-        title="Cómo denunciar y solicitar protección (México)",
-        country="MX",
-        tags=["denuncia", "proteccion", "orden", "compañero"],
-        steps=[
-            "Documenta incidentes (fechas, fotos de lesiones/daños, mensajes amenazantes).",
-            "Acude a la Fiscalía/Ministerio Público o llama para orientación legal gratuita.",
-            "Solicita una Orden de Protección si hay riesgo; puede incluir restricción de acercamiento.",
-            "Pregunta por refugios temporales y apoyo psicológico y legal.",
-        ],
-        contacts=[
-            {"name": "Fiscalía Local", "phone": "—", "url": "https://www.gob.mx/segob/acciones-y-programas/violencia-contra-las-mujeres"},
-            {"name": "LADA sin costo", "phone": "800 911 25 11", "url": "https://inmujeres.gob.mx"},
-        ],
-    ),
-]
-
-
-def _simple_match_score(text: str, proto: Protocol) -> float:
-    t = (text or "").lower()
-    score = 0.0
-    for token in set(t.split()):
-        if token in proto.title.lower():
-            score += 2.0
-        if token in " ".join(proto.tags).lower():
-            score += 1.0
-    return score
+# ------------------------------- KB ----------------------------------------
+# Protocolos cargados de data/protocols.json a un índice BM25 en memoria
+PROTOCOLS = build_default_index()
+# Peso de la similitud coseno al combinar con BM25 (solo si hay embeddings)
+PROTOCOL_SEMANTIC_WEIGHT = float(os.getenv("HELP_PROTOCOL_SEMANTIC_WEIGHT", "2.0"))
 
 
 # ------------------------------- TOOLS -------------------------------------
 
 def _get_emergency_contacts(country: str = "MX") -> List[Dict[str, str]]:
-    out: List[Dict[str, str]] = []
-    for p in KB:
-        if p.country.upper() == (country or "").upper():
-            out.extend(p.contacts)
-    # deduplicar por (name, phone)
-    seen = set()
-    uniq: List[Dict[str, str]] = []
-    for c in out:
-        key = (c.get("name"), c.get("phone"))
-        if key not in seen:
-            uniq.append(c)
-            seen.add(key)
-    return uniq
+    return PROTOCOLS.contacts(country) or list(FALLBACK_CONTACTS)
 
 @mcp.tool()
 def get_emergency_contacts(country: str = "MX") -> List[Dict[str, str]]:
@@ -113,23 +55,35 @@ def get_emergency_contacts(country: str = "MX") -> List[Dict[str, str]]:
 
 
 @mcp.tool()
-def search_protocols(query: str, country: str = "MX", top_k: int = 3) -> List[Dict[str, Any]]:
-    """Busca protocolos relevantes en el KB por texto libre y país."""
-    items: List[Dict[str, Any]] = []
-    for p in KB:
-        if country and p.country.upper() != country.upper():
-            continue
-        score = _simple_match_score(query, p)
-        if score > 0 or not query:
-            items.append({
-                "id": p.id,
-                "title": p.title,
-                "country": p.country,
-                "score": score,
-                "resource": f"kb://protocol/{p.id}",
-            })
-    items.sort(key=lambda x: x["score"], reverse=True)
-    return items[: max(1, top_k)]
+def search_protocols(
+    query: str,
+    country: str = "MX",
+    top_k: int = 3,
+    state: str = "",
+    semantic: bool = False,
+) -> List[Dict[str, Any]]:
+    """Busca protocolos relevantes en el KB (BM25 sin acentos) por texto libre, país y estado.
+
+    Con semantic=True y embeddings precalculados, combina también similitud semántica.
+    """
+    q_vec = None
+    if semantic and PROTOCOLS.embeddings is not None and (query or "").strip():
+        try:
+            q_vec = embed_texts([query.strip()])[0]
+        except Exception as e:
+            logger.warning("Embedding de consulta no disponible: %s", e)
+    hits = PROTOCOLS.search(
+        query, country=country, state=state, top_k=top_k,
+        query_vec=q_vec, semantic_weight=PROTOCOL_SEMANTIC_WEIGHT,
+    )
+    return [{
+        "id": p.id,
+        "title": p.title,
+        "country": p.country,
+        "state": p.state or None,
+        "score": round(score, 4),
+        "resource": f"kb://protocol/{p.id}",
+    } for p, score in hits]
 
 
 @mcp.tool()
@@ -166,34 +120,41 @@ def build_safety_plan(
 
 @mcp.resource("kb://protocol/{proto_id}")
 def read_protocol(proto_id: str) -> Dict[str, Any]:
-    for p in KB:
-        if p.id == proto_id:
-            return {
-                "id": p.id,
-                "title": p.title,
-                "country": p.country,
-                "tags": p.tags,
-                "steps": p.steps,
-                "contacts": p.contacts,
-            }
-    return {}
+    p = PROTOCOLS.by_id.get(proto_id)
+    if not p:
+        return {}
+    return {
+        "id": p.id,
+        "title": p.title,
+        "country": p.country,
+        "state": p.state or None,
+        "tags": p.tags,
+        "steps": p.steps,
+        "contacts": p.contacts,
+    }
 
 
 # ====================== RAG en PostgreSQL (otro schema) ====================
 
 @mcp.resource("help://chunk/{chunk_id}")
 def read_help_chunk(chunk_id: str) -> Dict[str, Any]:
-    with db() as conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-        cur.execute(f"""
+    with ROUTER.read() as conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+        STATEMENTS.execute(cur, "read_help_chunk", f"""
           SELECT c.id, c.chunk_no, c.content, d.title, d.country, d.source_uri
           FROM {HELP_DB_SCHEMA}.help_chunk c
           JOIN {HELP_DB_SCHEMA}.help_doc d ON d.id = c.doc_id
-          WHERE c.id = %s
-        """, (chunk_id,))
+          WHERE c.id = %(id)s
+        """, {"id": chunk_id})
         row = cur.fetchone()
     return row or {}
 
 
+@mcp.resource("stats://db")
+def db_stats() -> Dict[str, Any]:
+    """Conteo y tiempos por sentencia SQL y estado de primario/réplicas."""
+    return {"statements": STATEMENTS.report(), "router": ROUTER.stats()}
+
+
 @mcp.tool()
 def search_help(
     query: str,
@@ -205,20 +166,21 @@ def search_help(
     q = (query or "").strip()
     q_vec = embed_texts([q])[0]
 
-    with db() as conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+    with ROUTER.read() as conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
         base = f"""
           SELECT c.id, d.title, d.country, c.content,
-                 1 - (c.embedding <=> %s::vector) AS score
+                 1 - (c.embedding <=> %(vec)s::vector) AS score
           FROM {HELP_DB_SCHEMA}.help_chunk c
           JOIN {HELP_DB_SCHEMA}.help_doc d ON d.id = c.doc_id
         """
-        tail = " ORDER BY c.embedding <=> %s::vector LIMIT %s"
+        tail = " ORDER BY c.embedding <=> %(vec)s::vector LIMIT %(limit)s"
+        params = {"vec": q_vec, "limit": max(top_k, 5)}
         if country:
-            sql = base + " WHERE d.country = %s" + tail
-            cur.execute(sql, (q_vec, q_vec, country, max(top_k, 5)))
+            sql = base + " WHERE d.country = %(country)s" + tail
+            params["country"] = country
         else:
             sql = base + tail
-            cur.execute(sql, (q_vec, q_vec, max(top_k, 5)))
+        STATEMENTS.execute(cur, "search_help", sql, params)
         rows = cur.fetchall() or []
 
     vec = [{
@@ -238,12 +200,8 @@ def search_help(
 _BASE_DIR = Path(__file__).resolve().parent
 _DEFAULT_CRIME_PATH = _BASE_DIR / "data" / "crime_data.json"
 DATA_FILE = os.getenv("HELP_CRIME_DATA_FILE") or str(_DEFAULT_CRIME_PATH)
-CRIME_DATA: List[Dict[str, Any]] = []
-try:
-    with open(DATA_FILE, "r", encoding="utf-8") as f:
-        CRIME_DATA = json.load(f) or []
-except Exception:
-    CRIME_DATA = []
+# Segundos entre revisiones del archivo (0 desactiva la recarga en caliente)
+CRIME_RELOAD_INTERVAL = float(os.getenv("HELP_CRIME_RELOAD_INTERVAL", "30") or 0)
 
 # Utils
 MONTHS_ES = [
@@ -251,6 +209,12 @@ MONTHS_ES = [
     "Julio", "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre",
 ]
 
+# Candidatos de nombres de campo (flexibles a acentos y mayúsculas)
+C_ESTADO = ["Entidad", "Estado"]
+C_MUNICIPIO = ["Municipio"]
+C_DELITO = ["Delito", "Tipo", "Categoria", "Clasificacion"]
+C_YEAR = ["Año", "Anio", "Year"]
+
 def _norm(s: str) -> str:
     try:
         s = s.strip()
@@ -271,29 +235,6 @@ def _get_first(item: Dict[str, Any], candidates: List[str]) -> Optional[Any]:
             return item.get(k)
     return None
 
-def _get_month_value(item: Dict[str, Any], month: str) -> float:
-    if not month:
-        return 0.0
-    # intenta variantes de capitalización
-    keys = [month, month.title(), month.capitalize(), month.upper(), month.lower()]
-    for k in keys:
-        try:
-            v = item.get(k)
-            if v is None:
-                continue
-            return float(v)
-        except Exception:
-            continue
-    # intenta buscar por normalización
-    norm_month = _norm(month)
-    for k, v in item.items():
-        if _norm(k) == norm_month:
-            try:
-                return float(v)
-            except Exception:
-                return 0.0
-    return 0.0
-
 def _sum_months(item: Dict[str, Any]) -> float:
     total = 0.0
     for m in MONTHS_ES:
@@ -306,21 +247,142 @@ def _sum_months(item: Dict[str, Any]) -> float:
             continue
     return total
 
+
+@dataclass(frozen=True)
+class CrimeRow:
+    """Fila del JSON con campos normalizados precalculados para filtrar sin recomputar."""
+    item: Dict[str, Any]
+    estado: Any
+    municipio: Any
+    delito: Any
+    year: Any
+    estado_n: str
+    municipio_n: str
+    delito_n: str
+    year_s: str
+    texts_n: tuple          # valores string normalizados (para 'query')
+    months_n: Dict[str, float]  # mes normalizado → conteo
+    total: float
+
+
+@dataclass(frozen=True)
+class CrimeSnapshot:
+    """Versión inmutable del dataset; se reemplaza completa en cada recarga."""
+    rows: tuple
+    source: str
+    mtime_ns: int
+    size: int
+
+    @property
+    def version(self) -> str:
+        # Misma identidad que usa reload_crime_data para decidir si hubo cambio
+        return f"{self.mtime_ns:x}-{self.size:x}"
+
+    def uri(self, idx: int) -> str:
+        """URI estable del renglón: incluye la versión, así no apunta a otra fila tras recargar."""
+        return f"crime://item/{self.version}/{idx}"
+
+
+def _index_row(item: Dict[str, Any]) -> CrimeRow:
+    v_estado = _get_first(item, C_ESTADO)
+    v_muni = _get_first(item, C_MUNICIPIO)
+    v_delito = _get_first(item, C_DELITO)
+    v_year = _get_first(item, C_YEAR)
+    months: Dict[str, float] = {}
+    for k, v in item.items():
+        if isinstance(v, bool):
+            continue
+        try:
+            months.setdefault(_norm(k), float(v))
+        except Exception:
+            continue
+    return CrimeRow(
+        item=item,
+        estado=v_estado,
+        municipio=v_muni,
+        delito=v_delito,
+        year=v_year,
+        estado_n=_norm(str(v_estado)) if v_estado else "",
+        municipio_n=_norm(str(v_muni)) if v_muni else "",
+        delito_n=_norm(str(v_delito)) if v_delito else "",
+        year_s=str(v_year),
+        texts_n=tuple(_norm(v) for v in item.values() if isinstance(v, str)),
+        months_n=months,
+        total=_sum_months(item),
+    )
+
+
+def _load_crime_snapshot(path: str) -> CrimeSnapshot:
+    st = os.stat(path)
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f) or []
+    rows = tuple(_index_row(item) for item in data if isinstance(item, dict))
+    return CrimeSnapshot(rows=rows, source=path, mtime_ns=st.st_mtime_ns, size=st.st_size)
+
+
+_EMPTY_CRIME = CrimeSnapshot(rows=(), source=DATA_FILE, mtime_ns=0, size=0)
+try:
+    _CRIME: CrimeSnapshot = _load_crime_snapshot(DATA_FILE)
+except Exception:
+    _CRIME = _EMPTY_CRIME
+
+
+def _crime_snapshot() -> CrimeSnapshot:
+    # Lectura atómica de la referencia: cada tool trabaja con una sola versión
+    return _CRIME
+
+
+def reload_crime_data(force: bool = False) -> bool:
+    """Reconstruye el índice si el archivo cambió y lo intercambia de forma atómica.
+
+    Devuelve True si se publicó una nueva versión.
+    """
+    global _CRIME
+    current = _CRIME
+    try:
+        st = os.stat(DATA_FILE)
+    except OSError:
+        return False
+    if not force and (st.st_mtime_ns, st.st_size) == (current.mtime_ns, current.size):
+        return False
+    try:
+        fresh = _load_crime_snapshot(DATA_FILE)
+    except Exception as e:
+        # Archivo a medio escribir o inválido: conserva la versión vigente
+        logger.warning("No se pudo recargar %s: %s", DATA_FILE, e)
+        return False
+    _CRIME = fresh
+    logger.info("Datos de delitos recargados: %d filas (%s)", len(fresh.rows), DATA_FILE)
+    return True
+
+
+def _watch_crime_data(interval: float) -> None:
+    while True:
+        time.sleep(interval)
+        try:
+            reload_crime_data()
+        except Exception as e:
+            logger.warning("Watcher de datos de delitos: %s", e)
+
+
+if CRIME_RELOAD_INTERVAL > 0:
+    threading.Thread(
+        target=_watch_crime_data, args=(CRIME_RELOAD_INTERVAL,),
+        name="crime-data-watcher", daemon=True,
+    ).start()
+
+
 @mcp.tool()
 def search_crime_data(query: str, top_k: int = 5) -> List[Dict[str, Any]]:
     """Búsqueda simple de texto en campos string del JSON de delitos."""
     q = _norm(query or "")
+    snap = _crime_snapshot()
     out: List[Dict[str, Any]] = []
-    for idx, item in enumerate(CRIME_DATA):
-        hay = False
-        for v in item.values():
-            if isinstance(v, str) and q in _norm(v):
-                hay = True
-                break
-        if hay:
+    for idx, row in enumerate(snap.rows):
+        if any(q in t for t in row.texts_n):
             out.append({
-                "resource": f"crime://item/{idx}",
-                "preview": {k: v for k, v in item.items() if isinstance(v, str)}
+                "resource": snap.uri(idx),
+                "preview": {k: v for k, v in row.item.items() if isinstance(v, str)}
             })
             if len(out) >= top_k:
                 break
@@ -345,63 +407,50 @@ def crime_stats(
     """
     q = _norm(query)
     month_sel = month.strip()
+    month_n = _norm(month_sel)
+    estado_n = _norm(estado) if estado else ""
+    muni_n = _norm(municipio) if municipio else ""
+    delito_n = _norm(delito) if delito else ""
+    year_s = str(year) if year else ""
 
-    # Candidatos de nombres de campo (flexibles a acentos y mayúsculas)
-    C_ESTADO = ["Entidad", "Estado"]
-    C_MUNICIPIO = ["Municipio"]
-    C_DELITO = ["Delito", "Tipo", "Categoria", "Clasificacion"]
-    C_YEAR = ["Año", "Anio", "Year"]
-
+    snap = _crime_snapshot()
     rows: List[Dict[str, Any]] = []
-    for idx, item in enumerate(CRIME_DATA):
+    for idx, r in enumerate(snap.rows):
         # Filtro por query de texto
-        if q:
-            found = False
-            for v in item.values():
-                if isinstance(v, str) and q in _norm(v):
-                    found = True
-                    break
-            if not found:
-                continue
-
-        v_estado = _get_first(item, C_ESTADO)
-        v_muni = _get_first(item, C_MUNICIPIO)
-        v_delito = _get_first(item, C_DELITO)
-        v_year = _get_first(item, C_YEAR)
-
-        if estado and (not v_estado or _norm(estado) not in _norm(str(v_estado))):
+        if q and not any(q in t for t in r.texts_n):
+            continue
+        if estado_n and (not r.estado_n or estado_n not in r.estado_n):
             continue
-        if municipio and (not v_muni or _norm(municipio) not in _norm(str(v_muni))):
+        if muni_n and (not r.municipio_n or muni_n not in r.municipio_n):
             continue
-        if delito and (not v_delito or _norm(delito) not in _norm(str(v_delito))):
+        if delito_n and (not r.delito_n or delito_n not in r.delito_n):
             continue
-        if year and str(year) != str(v_year):
+        if year_s and year_s != r.year_s:
             continue
 
         if month_sel:
-            count = _get_month_value(item, month_sel)
+            count = r.months_n.get(month_n, 0.0)
             if count < min_count:
                 continue
             rows.append({
-                "resource": f"crime://item/{idx}",
-                "estado": v_estado,
-                "municipio": v_muni,
-                "delito": v_delito,
-                "year": v_year,
+                "resource": snap.uri(idx),
+                "estado": r.estado,
+                "municipio": r.municipio,
+                "delito": r.delito,
+                "year": r.year,
                 "month": month_sel,
                 "count": count,
             })
         else:
-            total = _sum_months(item)
-            if total < min_count:
+            if r.total < min_count:
                 continue
             rows.append({
-                "resource": f"crime://item/{idx}",
-                "estado": v_estado,
-                "municipio": v_muni,
-                "delito": v_delito,
-                "year": v_year,
-                "total": total,
+                "resource": snap.uri(idx),
+                "estado": r.estado,
+                "municipio": r.municipio,
+                "delito": r.delito,
+                "year": r.year,
+                "total": r.total,
             })
 
     # ordenar
@@ -409,15 +458,24 @@ def crime_stats(
     rows.sort(key=key, reverse=True)
     return rows[: max(1, top_k)]
 
-@mcp.resource("crime://item/{index}")
-def read_crime_item(index: str) -> Dict[str, Any]:
+@mcp.resource("crime://item/{version}/{index}")
+def read_crime_item(version: str, index: str) -> Dict[str, Any]:
+    snap = _crime_snapshot()
+    if version != snap.version:
+        # El índice es posicional: en otra versión apuntaría a otra fila
+        return {
+            "error": "stale",
+            "detail": "Los datos de delitos se recargaron; repite la búsqueda para obtener URIs vigentes.",
+            "version": version,
+            "current_version": snap.version,
+        }
     try:
         i = int(index)
     except Exception:
         return {}
-    if i < 0 or i >= len(CRIME_DATA):
+    if i < 0 or i >= len(snap.rows):
         return {}
-    return CRIME_DATA[i]
+    return snap.rows[i].item
 
 if __name__ == "__main__":
     mcp.run()
@@ -0,0 +1,127 @@
+"""
+Caché de lectura (TTL + LRU acotado) para get_customer / list_policies / get_policy.
+
+Cada entrada lleva etiquetas ("customer:<id>", "policy:<id>"). Las tools de
+escritura invalidan por etiqueta y, opcionalmente, un hilo escucha
+NOTIFY insurance_cache (triggers por sentencia, migración 0008) para invalidar
+también los cambios hechos por otros procesos; el aviso '*' vacía la caché.
+"""
+
+import logging
+import select
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Set, Tuple
+
+import psycopg2
+
+logger = logging.getLogger("insurance_mcp.cache")
+
+MISS = object()
+
+
+class TTLCache:
+    def __init__(self, maxsize: int = 2048, ttl: float = 30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any, Tuple[str, ...]]]" = OrderedDict()
+        self._tags: Dict[str, Set[Hashable]] = {}
+        self._lock = threading.Lock()
+        # Se incrementa en cada invalidación: una lectura iniciada antes no se guarda
+        self._epoch = 0
+        self.hits = 0
+        self.misses = 0
+
+    def begin(self) -> int:
+        return self._epoch
+
+    def get(self, key: Hashable) -> Any:
+        if self.maxsize <= 0:
+            return MISS
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return MISS
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, tags: Iterable[str] = (), token: int = -1) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            if token != -1 and token != self._epoch:
+                return
+            if key in self._data:
+                self._drop(key)
+            tags = tuple(tags)
+            self._data[key] = (time.monotonic() + self.ttl, value, tags)
+            for t in tags:
+                self._tags.setdefault(t, set()).add(key)
+            while len(self._data) > self.maxsize:
+                self._drop(next(iter(self._data)))
+
+    def invalidate(self, *tags: str) -> None:
+        with self._lock:
+            self._epoch += 1
+            for t in tags:
+                for key in list(self._tags.get(t, ())):
+                    self._drop(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._epoch += 1
+            self._data.clear()
+            self._tags.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses, "ttl": self.ttl}
+
+    def _drop(self, key: Hashable) -> None:
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return
+        for t in entry[2]:
+            keys = self._tags.get(t)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[t]
+
+
+def _listen(cache: TTLCache, dsn: str, channel: str) -> None:
+    backoff = 1.0
+    while True:
+        try:
+            conn = psycopg2.connect(dsn)
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {channel}")
+            # Pudimos perder avisos mientras no escuchábamos
+            cache.clear()
+            logger.info("Escuchando invalidaciones en canal %s", channel)
+            backoff = 1.0
+            while True:
+                if select.select([conn], [], [], 60.0) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    note = conn.notifies.pop(0)
+                    tags = note.payload.split()
+                    if "*" in tags:
+                        cache.clear()  # importación masiva: cambiaron demasiadas entidades
+                    else:
+                        cache.invalidate(*tags)
+        except Exception as e:
+            logger.warning("Listener de caché caído (%s); reintento en %.0fs", e, backoff)
+            cache.clear()
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 60.0)
+
+
+def start_listener(cache: TTLCache, dsn: str, channel: str = "insurance_cache") -> None:
+    threading.Thread(target=_listen, args=(cache, dsn, channel), name="cache-listener", daemon=True).start()
@@ -0,0 +1,266 @@
+"""
+SQL de las tools del MCP de seguros.
+
+Todas las consultas que ejecutan las tools viven aquí (constantes y
+constructores para las que dependen de filtros/cursor) para que
+`migrations check` pueda revisar sus planes con EXPLAIN.
+
+Se ejecutan como sentencias preparadas (tools/db_statements.py): los
+parámetros en posiciones donde Postgres no puede inferir el tipo llevan cast
+explícito.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+EMBED_DIM = 768  # columna product_chunk.embedding vector(768)
+
+CUSTOMER_BY_ID = "SELECT id, name, email, phone FROM customer WHERE id=%(cid)s"
+
+# Idempotencia de create_customer; cada rama usa su índice (migración 0007)
+CUSTOMER_DUPLICATE = """
+SELECT id, name, email, phone FROM customer WHERE lower(email) = lower(%(email)s)
+UNION ALL
+SELECT id, name, email, phone FROM customer WHERE %(phone)s::text <> '' AND phone = %(phone)s
+LIMIT 1
+"""
+
+CUSTOMER_INSERT = """
+INSERT INTO customer (id, name, email, phone)
+VALUES (%(id)s, %(name)s, %(email)s, %(phone)s)
+RETURNING id, name, email, phone
+"""
+
+PROFILE_INSERT = """
+INSERT INTO customer_profile (customer_id, rfc, birth_date, address)
+VALUES (%(cid)s, %(rfc)s, %(bd)s, %(address)s)
+"""
+
+# Inserta póliza + coberturas en una sola sentencia. ON CONFLICT usa el índice
+# único (customer_id, product_code, start_date) de la migración 0001.
+CREATE_POLICY = """
+WITH ins AS (
+  INSERT INTO policy (id, customer_id, product_code, status, start_date, end_date, premium_monthly)
+  SELECT %(id)s::uuid, c.id, %(prod)s::text, %(st)s::text, %(sd)s::date,
+         (%(sd)s::date + (INTERVAL '1 month' * %(tm)s::int))::date, %(prem)s::numeric
+  FROM customer c
+  WHERE c.id = %(cid)s
+  ON CONFLICT (customer_id, product_code, start_date) DO NOTHING
+  RETURNING id, customer_id, product_code, status, start_date, end_date, premium_monthly
+), covs AS (
+  INSERT INTO coverage (policy_id, name, limit_amount, deductible)
+  SELECT ins.id, v.name, v.limit_amount, v.deductible
+  FROM ins
+  CROSS JOIN unnest(%(cov_names)s::text[], %(cov_limits)s::numeric[], %(cov_deds)s::numeric[])
+       AS v(name, limit_amount, deductible)
+  RETURNING name, limit_amount, deductible
+)
+SELECT
+  (SELECT row_to_json(ins) FROM ins) AS policy,
+  (SELECT coalesce(json_agg(covs), '[]'::json) FROM covs) AS coverages,
+  EXISTS (SELECT 1 FROM customer WHERE id = %(cid)s) AS customer_exists
+"""
+
+POLICY_BY_KEY = """
+SELECT id, customer_id, product_code, status, start_date, end_date, premium_monthly
+FROM policy
+WHERE customer_id=%(cid)s AND product_code=%(prod)s AND start_date=%(sd)s::date
+"""
+
+POLICY_BY_ID = """
+SELECT id, customer_id, product_code, status, start_date, end_date, premium_monthly
+FROM policy WHERE id=%(pid)s
+"""
+
+COVERAGES_BY_POLICY = "SELECT name, limit_amount, deductible FROM coverage WHERE policy_id=%(pid)s"
+
+# Cliente + perfil + pólizas con coberturas en una sola consulta
+PORTFOLIO = """
+SELECT json_build_object(
+  'customer', json_build_object('id', c.id, 'name', c.name, 'email', c.email, 'phone', c.phone),
+  'profile', (
+    SELECT json_build_object('rfc', cp.rfc, 'birth_date', cp.birth_date, 'address', cp.address)
+    FROM customer_profile cp
+    WHERE cp.customer_id = c.id AND %(with_profile)s::boolean
+  ),
+  'policies', coalesce((
+    SELECT json_agg(json_build_object(
+             'id', po.id, 'product_code', po.product_code, 'status', po.status,
+             'start_date', po.start_date, 'end_date', po.end_date,
+             'premium_monthly', po.premium_monthly,
+             'coverages', coalesce((
+               SELECT json_agg(json_build_object(
+                        'name', cv.name, 'limit_amount', cv.limit_amount, 'deductible', cv.deductible))
+               FROM coverage cv
+               WHERE cv.policy_id = po.id
+             ), '[]'::json)
+           ) ORDER BY po.start_date DESC)
+    FROM policy po
+    WHERE po.customer_id = c.id AND (%(status)s::text = '' OR po.status = %(status)s)
+  ), '[]'::json)
+) AS portfolio
+FROM customer c
+WHERE c.id = %(cid)s
+"""
+
+CHUNK_BY_ID = """
+SELECT pc.id, pc.chunk_no, pc.content, d.product_code, d.version, d.source_uri
+FROM product_chunk pc
+JOIN product_doc d ON d.id = pc.doc_id
+WHERE pc.id = %(id)s
+"""
+
+# pgvector, <=> = cos_dist; similitud = 1 - cos_dist (índice HNSW de la migración 0007)
+VECTOR_SEARCH = """
+SELECT pc.id, d.product_code, d.version, pc.content,
+       1 - (pc.embedding <=> %(vec)s::vector) AS score
+FROM product_chunk pc
+JOIN product_doc d ON d.id = pc.doc_id
+ORDER BY pc.embedding <=> %(vec)s::vector
+LIMIT %(limit)s
+"""
+
+# Acento-insensible; el contenido se filtra con el índice trigram y el código de
+# producto por product_doc (pequeña) → product_chunk(doc_id)
+LEXICAL_SEARCH = """
+SELECT pc.id, d.product_code, d.version, pc.content
+FROM product_chunk pc
+JOIN product_doc d ON d.id = pc.doc_id
+WHERE pc.id IN (
+  SELECT id FROM product_chunk
+  WHERE lower(immutable_unaccent(content)) LIKE lower(immutable_unaccent(%(like)s))
+  UNION
+  SELECT c2.id FROM product_chunk c2 JOIN product_doc d2 ON d2.id = c2.doc_id
+  WHERE lower(immutable_unaccent(d2.product_code)) LIKE lower(immutable_unaccent(%(like)s))
+)
+ORDER BY pc.chunk_no ASC
+LIMIT %(limit)s
+"""
+
+CUSTOMER_FIELDS = {
+    "customer_id": "id AS customer_id",
+    "full_name": "name AS full_name",
+    "email": "email",
+    "phone": "phone",
+}
+
+POLICY_FIELDS = {
+    "id": "id",
+    "product_code": "product_code",
+    "status": "status",
+    "start_date": "start_date",
+    "end_date": "end_date",
+    "premium_monthly": "premium_monthly",
+}
+
+
+def like_escape(s: str) -> str:
+    return s.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def find_customer_query(
+    qname: str, qemail: str, qphone: str, limit: int, after: Optional[Sequence[Any]] = None
+) -> Tuple[str, Dict[str, Any], bool]:
+    """SQL de find_customer; devuelve (sql, params, ordenado_por_score)."""
+    # Expresiones idénticas a las de los índices GIN para que el planner los use
+    name_expr = "lower(immutable_unaccent(name))"
+    sql_where: List[str] = []
+    scores: List[str] = []
+    params: Dict[str, Any] = {"limit": limit + 1}
+    if qname:
+        params["name"] = qname
+        params["name_like"] = f"%{like_escape(qname)}%"
+        # subcadena o nombre parecido (errores de dedo)
+        sql_where.append(
+            f"({name_expr} LIKE lower(immutable_unaccent(%(name_like)s))"
+            f" OR {name_expr} %% lower(immutable_unaccent(%(name)s)))"
+        )
+        scores.append(f"similarity({name_expr}, lower(immutable_unaccent(%(name)s)))")
+    if qemail:
+        params["email"] = qemail.lower()
+        params["email_like"] = f"%{like_escape(qemail.lower())}%"
+        sql_where.append("lower(email) LIKE %(email_like)s")
+        scores.append("similarity(lower(email), %(email)s)")
+    if qphone:
+        params["phone_like"] = f"%{qphone}%"
+        sql_where.append("digits_only(phone) LIKE %(phone_like)s")
+
+    select = ", ".join(CUSTOMER_FIELDS.values())
+    where = " AND ".join(sql_where) or "TRUE"
+    if scores:
+        # relevancia: conjunto ya acotado por los índices GIN; keyset sobre (score, id)
+        sql = (
+            f"SELECT * FROM (SELECT {select}, greatest({', '.join(scores)}) AS score"
+            f" FROM customer WHERE {where}) q"
+        )
+        if after:
+            params.update(c_score=after[0], c_id=after[1])
+            sql += " WHERE (q.score < %(c_score)s::real OR (q.score = %(c_score)s::real AND q.customer_id > %(c_id)s::uuid))"
+        sql += " ORDER BY q.score DESC, q.customer_id ASC LIMIT %(limit)s"
+        return sql, params, True
+    # sin texto que puntuar: orden por índice customer(name, id)
+    sql = f"SELECT {select}, 1.0 AS score FROM customer WHERE {where}"
+    if after:
+        params.update(c_name=after[0], c_id=after[1])
+        sql += " AND (name, id) > (%(c_name)s, %(c_id)s::uuid)"
+    sql += " ORDER BY name ASC, id ASC LIMIT %(limit)s"
+    return sql, params, False
+
+
+def list_policies_query(
+    customer_id: str, status: str, cols: Sequence[str], limit: Optional[int], after: Optional[Sequence[Any]] = None
+) -> Tuple[str, Dict[str, Any]]:
+    """SQL de list_policies (keyset sobre start_date DESC, id DESC); limit None = todas."""
+    # id y start_date siempre se leen: forman el cursor
+    select = ", ".join(dict.fromkeys(["id", "start_date", *cols]))
+    sql = f"SELECT {select} FROM policy WHERE customer_id=%(cid)s"
+    # LIMIT NULL equivale a sin límite: misma sentencia preparada en ambos modos
+    params: Dict[str, Any] = {"cid": customer_id, "limit": None if limit is None else limit + 1}
+    if status:
+        sql += " AND status=%(s)s"
+        params["s"] = status
+    if after:
+        params.update(c_sd=after[0], c_id=after[1])
+        # mismo orden que el índice policy(customer_id, start_date DESC, id DESC)
+        sql += " AND (start_date, id) < (%(c_sd)s::date, %(c_id)s::uuid)"
+    sql += " ORDER BY start_date DESC, id DESC LIMIT %(limit)s"
+    return sql, params
+
+
+def explain_cases() -> List[Tuple[str, str, Dict[str, Any]]]:
+    """(nombre, sql, params de ejemplo) de cada consulta de las tools, para EXPLAIN."""
+    uid = "00000000-0000-0000-0000-000000000000"
+    vec = "[" + ",".join(["0.1"] * EMBED_DIM) + "]"
+    cases: List[Tuple[str, str, Dict[str, Any]]] = [
+        ("get_customer", CUSTOMER_BY_ID, {"cid": uid}),
+        ("create_customer.duplicate", CUSTOMER_DUPLICATE, {"email": "ana@example.com", "phone": "5512345678"}),
+        ("create_customer.insert", CUSTOMER_INSERT, {"id": uid, "name": "Ana", "email": "ana@example.com", "phone": ""}),
+        ("create_customer.profile", PROFILE_INSERT, {"cid": uid, "rfc": None, "bd": None, "address": None}),
+        ("create_policy", CREATE_POLICY, {
+            "id": uid, "cid": uid, "prod": "auto", "st": "pending", "sd": "2025-01-01", "tm": 12, "prem": 0,
+            "cov_names": ["rc"], "cov_limits": [0.0], "cov_deds": [0.0],
+        }),
+        ("create_policy.duplicate", POLICY_BY_KEY, {"cid": uid, "prod": "auto", "sd": "2025-01-01"}),
+        ("get_policy", POLICY_BY_ID, {"pid": uid}),
+        ("get_policy.coverages", COVERAGES_BY_POLICY, {"pid": uid}),
+        ("get_customer_portfolio", PORTFOLIO, {"cid": uid, "status": "", "with_profile": True}),
+        ("read_chunk", CHUNK_BY_ID, {"id": uid}),
+        ("search_products.vector", VECTOR_SEARCH, {"vec": vec, "limit": 5}),
+        ("search_products.lexical", LEXICAL_SEARCH, {"like": "%deducible%", "limit": 5}),
+    ]
+    for label, args in (
+        ("name", ("garcia", "", "")),
+        ("email", ("", "ana@", "")),
+        ("phone", ("", "", "5512")),
+        ("all", ("", "", "")),
+    ):
+        sql, params, ranked = find_customer_query(*args, limit=10)
+        cases.append((f"find_customer.{label}", sql, params))
+        after = (0.5, uid) if ranked else ("Ana", uid)
+        sql, params, _ = find_customer_query(*args, limit=10, after=after)
+        cases.append((f"find_customer.{label}.cursor", sql, params))
+    for status in ("", "active"):
+        sql, params = list_policies_query(uid, status, list(POLICY_FIELDS), 20)
+        cases.append((f"list_policies{'.status' if status else ''}", sql, params))
+    sql, params = list_policies_query(uid, "", list(POLICY_FIELDS), 20, after=("2025-01-01", uid))
+    cases.append(("list_policies.cursor", sql, params))
+    return cases
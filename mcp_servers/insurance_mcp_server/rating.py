@@ -0,0 +1,220 @@
+"""
+Tablas de tarificación compiladas para calc_premium / calc_premium_batch.
+
+Las tarifas viven en data/rating_tables.json (INSURANCE_RATING_FILE) o, con
+INSURANCE_RATING_SOURCE=db, en la tabla rating_table_version (última versión).
+Se compilan a una estructura inmutable con alias ya normalizados y bandas de
+edad/deducible precalculadas, de modo que cotizar son solo búsquedas O(1).
+Un watcher revisa la fuente y publica la nueva versión con un intercambio
+atómico de referencia.
+"""
+
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+import unicodedata
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+
+logger = logging.getLogger("insurance_mcp.rating")
+
+_BASE_DIR = Path(__file__).resolve().parent
+RATING_FILE = os.getenv("INSURANCE_RATING_FILE") or str(_BASE_DIR / "data" / "rating_tables.json")
+RATING_SOURCE = os.getenv("INSURANCE_RATING_SOURCE", "file").strip().lower()  # "file" o "db"
+MAX_AGE = 120
+
+
+@lru_cache(maxsize=4096)
+def norm_key(s: Any) -> str:
+    if not s: return ""
+    return unicodedata.normalize("NFKD", str(s)).encode("ascii", "ignore").decode().lower().strip()
+
+
+@dataclass(frozen=True)
+class RatingTables:
+    version: str
+    currency: str
+    base_by_product: Mapping[str, float]
+    default_base: float
+    lcm: float
+    # clave normalizada (incluye alias) → (clave canónica, valor)
+    risk: Mapping[str, Tuple[str, float]]
+    territory: Mapping[str, Tuple[str, float]]
+    add_ons: Mapping[str, float]
+    default_age: int
+    age_discount: Tuple[float, ...]        # índice = edad (0..MAX_AGE)
+    ded_thresholds: Tuple[float, ...]      # ascendente
+    ded_factors: Tuple[float, ...]         # len = thresholds + 1 (bisect_right)
+    si_reference: float
+    si_min_factor: float
+    si_max_factor: float
+    tax_rate: float
+    broker_rate: float
+    stamp: Any = None                      # (mtime_ns, size) o versión en BD
+
+    def base_premium(self, product_code: str) -> float:
+        return self.base_by_product.get(norm_key(product_code), self.default_base)
+
+    def risk_factor(self, risk_class: str) -> Tuple[str, float]:
+        k = norm_key(risk_class)
+        return self.risk.get(k, (k, 1.0))
+
+    def territory_factor(self, territory: str) -> Tuple[str, float]:
+        k = norm_key(territory)
+        return self.territory.get(k, (k, 1.0))
+
+    def add_ons_total(self, add_ons) -> float:
+        return sum(self.add_ons.get(norm_key(x), 0.0) for x in (add_ons or []))
+
+    def age_disc(self, age: int) -> float:
+        return self.age_discount[min(max(int(age), 0), MAX_AGE)]
+
+    def deductible_factor(self, ded: float) -> float:
+        return self.ded_factors[bisect.bisect_right(self.ded_thresholds, ded)]
+
+    def sum_insured_factor(self, si: float) -> float:
+        if not si:
+            return 1.0
+        return min(max(si / self.si_reference, self.si_min_factor), self.si_max_factor)
+
+
+def _with_aliases(values: Dict[str, float], aliases: Dict[str, str]) -> Mapping[str, Tuple[str, float]]:
+    out: Dict[str, Tuple[str, float]] = {norm_key(k): (norm_key(k), float(v)) for k, v in values.items()}
+    for alias, target in (aliases or {}).items():
+        t = norm_key(target)
+        if t in out:
+            out.setdefault(norm_key(alias), out[t])
+    return MappingProxyType(out)
+
+
+def compile_tables(raw: Dict[str, Any], stamp: Any = None) -> RatingTables:
+    """Valida y compila el JSON de tarifas a una estructura inmutable."""
+    aliases = raw.get("aliases") or {}
+
+    base = {norm_key(k): float(v) for k, v in raw["base_by_product"].items()}
+    for alias, target in (aliases.get("product_code") or {}).items():
+        if norm_key(target) in base:
+            base.setdefault(norm_key(alias), base[norm_key(target)])
+
+    add_ons = {norm_key(k): float(v) for k, v in raw.get("add_on_catalog", {}).items()}
+    for alias, target in (aliases.get("add_ons") or {}).items():
+        if norm_key(target) in add_ons:
+            add_ons.setdefault(norm_key(alias), add_ons[norm_key(target)])
+
+    # bandas de edad: la primera que aplica gana; sin banda → 0.0
+    bands = raw.get("age_bands") or []
+    ages = []
+    for age in range(MAX_AGE + 1):
+        disc = 0.0
+        for b in bands:
+            if b.get("min", 0) <= age <= b.get("max", MAX_AGE):
+                disc = float(b["discount"])
+                break
+        ages.append(disc)
+
+    ded_bands = sorted(raw.get("deductible_bands") or [], key=lambda b: float(b["min"]))
+    si = raw.get("sum_insured") or {}
+
+    return RatingTables(
+        version=str(raw.get("version") or "sin-version"),
+        currency=raw.get("currency", "MXN"),
+        base_by_product=MappingProxyType(base),
+        default_base=float(raw.get("default_base_premium", 6000.0)),
+        lcm=float(raw.get("lcm", 1.0)),
+        risk=_with_aliases(raw.get("risk_factors") or {}, aliases.get("risk_class")),
+        territory=_with_aliases(raw.get("territory_factors") or {}, aliases.get("territory")),
+        add_ons=MappingProxyType(add_ons),
+        default_age=int(raw.get("default_age", 35)),
+        age_discount=tuple(ages),
+        ded_thresholds=tuple(float(b["min"]) for b in ded_bands),
+        ded_factors=(1.0, *(float(b["factor"]) for b in ded_bands)),
+        si_reference=float(si.get("reference", 300000.0)),
+        si_min_factor=float(si.get("min_factor", 0.6)),
+        si_max_factor=float(si.get("max_factor", 3.0)),
+        tax_rate=float(raw.get("tax_rate", 0.16)),
+        broker_rate=float(raw.get("broker_rate", 0.10)),
+        stamp=stamp,
+    )
+
+
+class RatingStore:
+    """Mantiene la versión vigente de las tarifas y la reemplaza si cambia la fuente."""
+
+    def __init__(self, path: str = RATING_FILE, source: str = RATING_SOURCE,
+                 connect: Optional[Callable[[], Any]] = None):
+        self.path = path
+        self.source = source
+        self.connect = connect
+        self._tables: Optional[RatingTables] = None
+
+    def current(self) -> RatingTables:
+        tables = self._tables
+        if tables is None:
+            self.refresh(force=True)
+            tables = self._tables
+        return tables  # type: ignore[return-value]
+
+    def _file_stamp(self) -> Tuple[int, int]:
+        st = os.stat(self.path)
+        return (st.st_mtime_ns, st.st_size)
+
+    def _load_file(self) -> RatingTables:
+        stamp = self._file_stamp()
+        with open(self.path, "r", encoding="utf-8") as f:
+            return compile_tables(json.load(f), stamp=stamp)
+
+    def _db_version(self, cur) -> Optional[str]:
+        cur.execute("SELECT version FROM rating_table_version ORDER BY created_at DESC, version DESC LIMIT 1")
+        row = cur.fetchone()
+        return (row[0] if not isinstance(row, dict) else row["version"]) if row else None
+
+    def refresh(self, force: bool = False) -> bool:
+        """Recompila si la fuente cambió; devuelve True si publicó una nueva versión."""
+        current = self._tables
+        fresh: Optional[RatingTables] = None
+        if self.source == "db" and self.connect is not None:
+            try:
+                conn = self.connect()
+                try:
+                    with conn.cursor() as cur:
+                        version = self._db_version(cur)
+                        if version and (force or current is None or current.stamp != ("db", version)):
+                            cur.execute("SELECT tables FROM rating_table_version WHERE version=%s", (version,))
+                            row = cur.fetchone()
+                            raw = row[0] if not isinstance(row, dict) else row["tables"]
+                            fresh = compile_tables(raw if isinstance(raw, dict) else json.loads(raw), stamp=("db", version))
+                        elif version:
+                            return False
+                finally:
+                    conn.close()
+            except Exception as e:
+                if current is not None:
+                    logger.warning("No se pudieron leer tarifas de BD (%s); se conserva la versión %s.", e, current.version)
+                    return False
+                logger.warning("No se pudieron leer tarifas de BD (%s); se usa el archivo.", e)
+        if fresh is None:
+            if not force and current is not None and current.stamp == self._file_stamp():
+                return False
+            fresh = self._load_file()
+        self._tables = fresh
+        logger.info("Tarifas publicadas: versión %s", fresh.version)
+        return True
+
+    def _watch(self, interval: float) -> None:
+        while True:
+            time.sleep(interval)
+            try:
+                self.refresh()
+            except Exception as e:
+                # JSON a medio escribir o inválido: conserva la versión vigente
+                logger.warning("No se pudieron recargar tarifas: %s", e)
+
+    def start_watcher(self, interval: float) -> None:
+        if interval > 0:
+            threading.Thread(target=self._watch, args=(interval,), name="rating-watcher", daemon=True).start()
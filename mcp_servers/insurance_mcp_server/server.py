@@ -1,10 +1,16 @@
 # mcp_server.py
+import io
+import json
+import base64
 import uuid
+import itertools
 from datetime import date
-from typing import List, Dict
+from typing import List, Dict, Optional, Union
 import os
+import logging
 from uuid import UUID
 
+import numpy as np
 import psycopg2, psycopg2.extras
 from pgvector.psycopg2 import register_vector
 from dotenv import load_dotenv, find_dotenv
@@ -12,6 +18,13 @@ from fastmcp import FastMCP
 from pydantic import BaseModel
 
 from tools.embed_client import embed_texts  # tu implementación
+from tools.db_router import DbRouter
+from tools.db_statements import StatementRegistry
+from .migrations import apply_migrations
+from .rating import RatingStore, RatingTables
+from .cache import MISS, TTLCache, start_listener
+from .bulk import import_customers, import_policies, iter_records
+from . import queries as Q
 
 # Carga .env aun si cambia el cwd
 load_dotenv(find_dotenv())
@@ -23,12 +36,56 @@ if not DB_DSN:
 TOPK = int(os.getenv("RAG_TOPK", "5"))
 
 mcp = FastMCP("insurance-mcp")
+# Las migraciones (DDL, índices) se corren aparte: python -m mcp_servers.insurance_mcp_server.migrations apply
+AUTO_MIGRATE = os.getenv("INSURANCE_AUTO_MIGRATE", "false").lower() in ("1","true","yes")
 
 def db():
+    """Conexión directa al primario (migraciones, tarifas, importación masiva)."""
     conn = psycopg2.connect(DB_DSN)
     register_vector(conn)
     return conn
 
+# Tools: escrituras al primario, lecturas a réplicas (DB_REPLICA_DSNS) con pool
+ROUTER = DbRouter.from_env(DB_DSN, os.getenv("DB_REPLICA_DSNS", ""), setup=register_vector)
+# Sentencias preparadas por conexión del pool + conteo/tiempos (recurso stats://db)
+STATEMENTS = StatementRegistry()
+
+if AUTO_MIGRATE:
+    try:
+        _conn = db()
+        try:
+            apply_migrations(_conn)
+        finally:
+            _conn.close()
+    except Exception as e:
+        # Las tools de lectura siguen funcionando; create_policy se niega (ver _policy_key_ready)
+        logging.getLogger("insurance_mcp").error("No se pudieron aplicar migraciones: %s", e)
+
+# create_policy usa ON CONFLICT sobre el índice único de la migración 0001
+_POLICY_KEY_INDEX = "policy_customer_product_start_uq"
+_policy_key_ok = False
+
+def _policy_key_ready(cur) -> None:
+    """Falla solo create_policy si falta el índice único (migraciones sin aplicar)."""
+    global _policy_key_ok
+    if _policy_key_ok:
+        return
+    cur.execute("SELECT to_regclass(%s) IS NOT NULL AS ok", (_POLICY_KEY_INDEX,))
+    if not cur.fetchone()["ok"]:
+        raise RuntimeError(
+            "create_policy no disponible: falta la migración 0001 "
+            "(python -m mcp_servers.insurance_mcp_server.migrations apply)"
+        )
+    _policy_key_ok = True
+
+# Caché de lecturas (get_customer/list_policies/get_policy); 0 desactiva
+CACHE = TTLCache(
+    maxsize=int(os.getenv("INSURANCE_CACHE_MAX", "2048")),
+    ttl=float(os.getenv("INSURANCE_CACHE_TTL", "30")),
+)
+if os.getenv("INSURANCE_CACHE_LISTEN", "false").lower() in ("1","true","yes"):
+    start_listener(CACHE, DB_DSN)
+
 # --------- Modelos estrictos para esquemas de tools (evita anyOf) ---------
 
 class CoverageItem(BaseModel):
@@ -46,10 +103,10 @@ def create_policy(
     term_months: int = 12,
     premium_monthly: float = 0.0,
     status: str = "pending",         # pendiente por defecto
-    activate: bool = False,          # si True, activa tras crear
+    activate: bool = False,          # si True, se crea ya activa
     coverages: List[CoverageItem] = [],
 ) -> dict:
-    _ = UUID(customer_id)
+    customer_id = str(UUID(customer_id))
     if status not in ("active", "pending", "lapsed"):
         raise ValueError("status inválido")
 
@@ -63,136 +120,207 @@ def create_policy(
         c["limit_amount"] = float(c.get("limit_amount", 0) or 0)
         c["deductible"]   = float(c.get("deductible", 0) or 0)
 
-    with db() as conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-        # idempotencia
-        cur.execute("""
-          SELECT id, customer_id, product_code, status, start_date, end_date, premium_monthly
-          FROM policy
-          WHERE customer_id=%s AND product_code=%s AND start_date=%s
-          ORDER BY id LIMIT 1
-        """, (customer_id, product_code, start_date))
-        dup = cur.fetchone()
-        if dup:
-            return {"policy": dup, "coverages": [], "duplicate": True}
-
-        new_id = str(uuid.uuid4())
+    final_status = "active" if activate else status
+    params = {
+        "id": str(uuid.uuid4()),
+        "cid": customer_id,
+        "prod": product_code,
+        "st": final_status,
+        "sd": start_date,
+        "tm": term_months,
+        "prem": premium_monthly,
+        "cov_names": [c["name"] for c in covs],
+        "cov_limits": [c["limit_amount"] for c in covs],
+        "cov_deds": [c["deductible"] for c in covs],
+    }
 
-        cur.execute("SELECT 1 FROM customer WHERE id=%s", (customer_id,))
-        if not cur.fetchone():
+    with ROUTER.write() as conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+        _policy_key_ready(cur)
+        # Un solo viaje: póliza (idempotente por índice único) + coberturas multi-fila
+        STATEMENTS.execute(cur, "create_policy", Q.CREATE_POLICY, params)
+        res = cur.fetchone()
+        if not res["customer_exists"]:
             raise ValueError("customer_id no existe")
+        if res["policy"]:
+            CACHE.invalidate(f"customer:{customer_id}")
+            return {"policy": res["policy"], "coverages": res["coverages"], "duplicate": False}
 
-        cur.execute("SELECT 1 FROM product_doc WHERE product_code=%s LIMIT 1", (product_code,))
-        _ = cur.fetchone()
-
-        cur.execute(
-            """
-            INSERT INTO policy (id, customer_id, product_code, status, start_date, end_date, premium_monthly)
-            VALUES (
-              %(id)s, %(cid)s, %(prod)s, %(st)s, %(sd)s,
-              (%(sd)s::date + (INTERVAL '1 month' * %(tm)s))::date,
-              %(prem)s
-            )
-            RETURNING id, customer_id, product_code, status, start_date, end_date, premium_monthly
-            """,
-            {
-                "id": new_id,
-                "cid": customer_id,
-                "prod": product_code,
-                "st": status,
-                "sd": start_date,
-                "tm": term_months,
-                "prem": premium_monthly,
-            },
-        )
-        pol = cur.fetchone()
-
-        out_covs: List[Dict] = []
-        for c in covs:
-            cur.execute(
-                """
-                INSERT INTO coverage (policy_id, name, limit_amount, deductible)
-                VALUES (%(pid)s, %(name)s, %(lim)s, %(ded)s)
-                RETURNING name, limit_amount, deductible
-                """,
-                {"pid": new_id, "name": c["name"], "lim": c["limit_amount"], "ded": c["deductible"]},
-            )
-            out_covs.append(cur.fetchone())
-
-        if activate and pol:
-            cur.execute("UPDATE policy SET status='active' WHERE id=%s RETURNING status", (pol["id"],))
-            pol["status"] = cur.fetchone()["status"]
-
-    return {"policy": pol or {}, "coverages": out_covs, "duplicate": False}
+        # Conflicto (ya existía o reintento concurrente): devuelve la existente
+        STATEMENTS.execute(cur, "create_policy.duplicate", Q.POLICY_BY_KEY, {"cid": customer_id, "prod": product_code, "sd": start_date})
+        dup = cur.fetchone()
+    return {"policy": dup or {}, "coverages": [], "duplicate": True}
 
 @mcp.tool()
 def get_customer(customer_id: str) -> dict:
     """Obtiene un cliente por ID."""
-    _ = UUID(customer_id)
-    with db() as conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-        cur.execute("SELECT id, name, email, phone FROM customer WHERE id=%s", (customer_id,))
+    customer_id = str(UUID(customer_id))
+    key = ("customer", customer_id)
+    cached = CACHE.get(key)
+    if cached is not MISS:
+        return cached
+    token = CACHE.begin()
+    with ROUTER.read() as conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+        STATEMENTS.execute(cur, "get_customer", Q.CUSTOMER_BY_ID, {"cid": customer_id})
         row = cur.fetchone()
+    if row:
+        CACHE.set(key, row, tags=(f"customer:{customer_id}",), token=token)
     return row or {}
 
+# ---- Paginación keyset (cursor opaco) y proyección de campos ----
+MAX_PAGE = 100
+
+def _page_limit(limit: int, default: int) -> int:
+    return max(1, min(int(limit or default), MAX_PAGE))
+
+def _encode_cursor(*values) -> str:
+    raw = json.dumps([v.isoformat() if hasattr(v, "isoformat") else str(v) if isinstance(v, UUID) else v
+                      for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def _decode_cursor(cursor: str) -> list:
+    try:
+        pad = "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(cursor + pad).decode())
+    except Exception:
+        raise ValueError("cursor inválido")
+    if not isinstance(values, list) or len(values) != 2:
+        raise ValueError("cursor inválido")
+    return values
+
+def _select_fields(fields: List[str], allowed: Dict[str, str]) -> List[str]:
+    if not fields:
+        return list(allowed)
+    bad = [f for f in fields if f not in allowed]
+    if bad:
+        raise ValueError(f"campos no permitidos: {', '.join(bad)} (usa: {', '.join(allowed)})")
+    return [f for f in allowed if f in fields]
+
+def _page(rows: List[dict], limit: Optional[int], cols: List[str], cursor_of, paged: bool) -> Union[List[dict], dict]:
+    # Sin cursor/page_size se conserva la forma original (lista); la paginación es opcional
+    more = limit is not None and len(rows) > limit
+    rows = rows[:limit]
+    items = [{k: r[k] for k in cols} for r in rows]
+    if not paged:
+        return items
+    next_cursor = cursor_of(rows[-1]) if more and rows else None
+    return {"items": items, "next_cursor": next_cursor}
+
 @mcp.tool()
 def find_customer(
     full_name: str = "",
     name: str = "",
     email: str = "",
     phone: str = "",
-) -> List[dict]:
-    """Búsqueda flexible por nombre/email/teléfono (requiere EXTENSION unaccent)."""
+    limit: int = 10,
+    cursor: str = "",
+    page_size: int = 0,
+    fields: List[str] = [],
+) -> Union[List[dict], dict]:
+    """
+    Búsqueda flexible por nombre/email/teléfono (pg_trgm, migración 0003).
+
+    - Con nombre/email ordena por similitud ('score'); sin ellos, por nombre.
+    - Devuelve una lista de hasta 'limit' clientes. Con 'page_size' o 'cursor'
+      devuelve {items, next_cursor}; 'cursor' es el next_cursor de la página anterior.
+    - 'fields': subconjunto de customer_id, full_name, email, phone, score.
+    """
     qname = (full_name or name).strip()
-    with db() as conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-        sql = [
-            "SELECT id AS customer_id, name AS full_name, email, phone",
-            "FROM customer",
-            "WHERE 1=1",
-        ]
-        params: Dict[str, str] = {}
-        if qname:
-            sql.append("AND unaccent(name) ILIKE unaccent(%(name)s)")
-            params["name"] = f"%{qname}%"
-        if email:
-            sql.append("AND unaccent(email) ILIKE unaccent(%(email)s)")
-            params["email"] = f"%{email.strip()}%"
-        if phone:
-            sql.append("AND phone LIKE %(phone)s")
-            params["phone"] = f"%{phone.strip()}%"
-        sql.append("ORDER BY full_name ASC LIMIT 10")
-        cur.execute("\n".join(sql), params)
+    qemail = email.strip()
+    qphone = "".join(ch for ch in phone if ch.isdigit())
+    paged = bool(cursor or page_size)
+    limit = _page_limit(page_size or limit, 10)
+    cols = _select_fields(fields, {**Q.CUSTOMER_FIELDS, "score": "score"})
+    sql, params, ranked = Q.find_customer_query(
+        qname, qemail, qphone, limit, _decode_cursor(cursor) if cursor else None
+    )
+    if ranked:
+        cursor_of = lambda r: _encode_cursor(r["score"], r["customer_id"])
+    else:
+        cursor_of = lambda r: _encode_cursor(r["full_name"], r["customer_id"])
+    with ROUTER.read() as conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+        STATEMENTS.execute(cur, "find_customer", sql, params)
         rows = cur.fetchall()
-    return rows or []
+    return _page(rows, limit, cols, cursor_of, paged)
 
 @mcp.tool()
-def list_policies(customer_id: str, status: str = "") -> List[dict]:
-    """Lista pólizas de un cliente."""
-    _ = UUID(customer_id)
-    sql = """
-      SELECT id, product_code, status, start_date, end_date, premium_monthly
-      FROM policy WHERE customer_id=%(cid)s
+def list_policies(
+    customer_id: str,
+    status: str = "",
+    cursor: str = "",
+    page_size: int = 0,
+    fields: List[str] = [],
+) -> Union[List[dict], dict]:
     """
-    params: Dict[str, str] = {"cid": customer_id}
-    if status:
-        sql += " AND status=%(s)s"
-        params["s"] = status
-    sql += " ORDER BY start_date DESC"
-    with db() as conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-        cur.execute(sql, params)
+    Lista pólizas de un cliente (más recientes primero).
+
+    - Sin 'page_size' ni 'cursor' devuelve una lista con todas las pólizas.
+    - Con 'page_size' (máx. 100) o 'cursor' devuelve {items, next_cursor} con
+      hasta 'page_size' pólizas (20 si no se indica); 'cursor' es el
+      next_cursor de la página anterior y next_cursor es null en la última.
+    - 'fields': subconjunto de id, product_code, status, start_date, end_date, premium_monthly.
+    """
+    customer_id = str(UUID(customer_id))
+    paged = bool(cursor or page_size)
+    limit = _page_limit(page_size, 20) if paged else None
+    cols = _select_fields(fields, Q.POLICY_FIELDS)
+    key = ("policies", customer_id, status, limit, cursor, paged, tuple(cols))
+    cached = CACHE.get(key)
+    if cached is not MISS:
+        return cached
+    token = CACHE.begin()
+    sql, params = Q.list_policies_query(
+        customer_id, status, cols, limit, _decode_cursor(cursor) if cursor else None
+    )
+    with ROUTER.read() as conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+        STATEMENTS.execute(cur, "list_policies", sql, params)
         rows = cur.fetchall()
-    return rows
+    out = _page(rows, limit, cols, lambda r: _encode_cursor(r["start_date"], r["id"]), paged)
+    CACHE.set(key, out, tags=(f"customer:{customer_id}",), token=token)
+    return out
 
 @mcp.tool()
 def get_policy(policy_id: str) -> dict:
     """Obtiene una póliza y sus coberturas."""
-    _ = UUID(policy_id)
-    with db() as conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-        cur.execute("""SELECT id, customer_id, product_code, status, start_date, end_date, premium_monthly
-                       FROM policy WHERE id=%s""", (policy_id,))
+    policy_id = str(UUID(policy_id))
+    key = ("policy", policy_id)
+    cached = CACHE.get(key)
+    if cached is not MISS:
+        return cached
+    token = CACHE.begin()
+    with ROUTER.read() as conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+        STATEMENTS.execute(cur, "get_policy", Q.POLICY_BY_ID, {"pid": policy_id})
         pol = cur.fetchone()
-        cur.execute("""SELECT name, limit_amount, deductible
-                       FROM coverage WHERE policy_id=%s""", (policy_id,))
+        STATEMENTS.execute(cur, "get_policy.coverages", Q.COVERAGES_BY_POLICY, {"pid": policy_id})
         cov = cur.fetchall()
-    return {"policy": pol or {}, "coverages": cov}
+    out = {"policy": pol or {}, "coverages": cov}
+    if pol:
+        CACHE.set(key, out, tags=(f"policy:{policy_id}", f"customer:{pol['customer_id']}"), token=token)
+    return out
+
+@mcp.tool()
+def get_customer_portfolio(customer_id: str, status: str = "", include_profile: bool = True) -> dict:
+    """Cliente, perfil opcional y todas sus pólizas con coberturas en una sola llamada."""
+    customer_id = str(UUID(customer_id))
+    key = ("portfolio", customer_id, status, include_profile)
+    cached = CACHE.get(key)
+    if cached is not MISS:
+        return cached
+    token = CACHE.begin()
+    with ROUTER.read() as conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+        STATEMENTS.execute(cur, "get_customer_portfolio", Q.PORTFOLIO, {"cid": customer_id, "status": status, "with_profile": include_profile})
+        row = cur.fetchone()
+    if not row:
+        return {}
+    out = row["portfolio"]
+    active = [p for p in out["policies"] if p.get("status") == "active"]
+    out["summary"] = {
+        "policies": len(out["policies"]),
+        "active": len(active),
+        "premium_monthly_active": round(sum(float(p.get("premium_monthly") or 0) for p in active), 2),
+    }
+    tags = [f"customer:{customer_id}"] + [f"policy:{p['id']}" for p in out["policies"]]
+    CACHE.set(key, out, tags=tags, token=token)
+    return out
 
 # ==================== RESOURCE + TOOL: RAG de productos ====================
 
@@ -200,16 +328,16 @@ def get_policy(policy_id: str) -> dict:
 def read_chunk(chunk_id: str):
     """Recurso RAG (solo lectura)."""
     _ = UUID(chunk_id)
-    with db() as conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-        cur.execute("""
-          SELECT pc.id, pc.chunk_no, pc.content, d.product_code, d.version, d.source_uri
-          FROM product_chunk pc
-          JOIN product_doc d ON d.id = pc.doc_id
-          WHERE pc.id = %s
-        """, (chunk_id,))
+    with ROUTER.read() as conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+        STATEMENTS.execute(cur, "read_chunk", Q.CHUNK_BY_ID, {"id": chunk_id})
         row = cur.fetchone()
     return row or {}
 
+@mcp.resource("stats://db")
+def db_stats() -> dict:
+    """Conteo y tiempos por sentencia SQL y estado de primario/réplicas."""
+    return {"statements": STATEMENTS.report(), "router": ROUTER.stats(), "cache": CACHE.stats()}
+
 @mcp.tool()
 def search_products(
     query: str,
@@ -231,15 +359,8 @@ def search_products(
     q_vec = embed_texts([q])[0]
 
     # 1) Vector (pgvector, <=> = cos_dist; similitud = 1 - cos_dist)
-    with db() as conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-        cur.execute("""
-          SELECT pc.id, d.product_code, d.version, pc.content,
-                 1 - (pc.embedding <=> %s::vector) AS score
-          FROM product_chunk pc
-          JOIN product_doc d ON d.id = pc.doc_id
-          ORDER BY pc.embedding <=> %s::vector
-          LIMIT %s
-        """, (q_vec, q_vec, max(top_k, 5)))
+    with ROUTER.read() as conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+        STATEMENTS.execute(cur, "search_products.vector", Q.VECTOR_SEARCH, {"vec": q_vec, "limit": max(top_k, 5)})
         rows = cur.fetchall()
 
     vec = [{
@@ -255,16 +376,8 @@ def search_products(
         return vec[:top_k]
 
     # 2) Léxico (acento-insensible)
-    with db() as conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-        cur.execute("""
-          SELECT pc.id, d.product_code, d.version, pc.content
-          FROM product_chunk pc
-          JOIN product_doc d ON d.id = pc.doc_id
-          WHERE unaccent(pc.content) ILIKE unaccent(%s)
-             OR unaccent(d.product_code) ILIKE unaccent(%s)
-          ORDER BY pc.chunk_no ASC
-          LIMIT %s
-        """, (f"%{q}%", f"%{q}%", max(top_k, 5)))
+    with ROUTER.read() as conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+        STATEMENTS.execute(cur, "search_products.lexical", Q.LEXICAL_SEARCH, {"like": f"%{Q.like_escape(q)}%", "limit": max(top_k, 5)})
         lex = cur.fetchall()
 
     if lex:
@@ -307,6 +420,12 @@ def search_products(
 
 # ===================== TOOL: cálculo teórico de prima ======================
 
+# Tarifas compiladas (data/rating_tables.json o BD), recargadas en caliente
+RATING = RatingStore(connect=db)
+RATING.current()
+RATING.start_watcher(float(os.getenv("INSURANCE_RATING_RELOAD_INTERVAL", "30") or 0))
+MAX_BATCH_SCENARIOS = 500
+
 @mcp.tool()
 def calc_premium(
     product_code: str,
@@ -319,47 +438,32 @@ def calc_premium(
     car_model: str = "",
 ) -> dict:
     """Calcula una prima teórica. Devuelve desglose y total_premium."""
-    import unicodedata
-    def _norm(s):
-        if not s: return ""
-        s = unicodedata.normalize("NFKD", str(s)).encode("ascii", "ignore").decode().lower().strip()
-        return s
-
-    pc = _norm(product_code)
-    rclass = _norm(risk_class)
-    terr = _norm(territory)
-
-    base_by_product = {
-        "auto": 9000.0, "auto-basico": 7000.0, "auto-completo": 12000.0,
-        "hogar": 4500.0, "vida": 3800.0, "salud": 5200.0,
-    }
-    base_premium = base_by_product.get(pc, 6000.0)
+    rt = RATING.current()
+
+    base_premium = rt.base_premium(product_code)
 
-    lcm = 1.05
-    risk_factor = {"alto": 1.25, "alto1": 1.25, "alto2": 1.15, "estandar": 1.0, "bajo": 0.9}.get(rclass, 1.0)
-    terr_factor = {"cdmx": 1.15, "edomex": 1.10, "gdl": 1.08, "mty": 1.08}.get(terr, 1.0)
+    lcm = rt.lcm
+    rclass, risk_factor = rt.risk_factor(risk_class)
+    terr, terr_factor = rt.territory_factor(territory)
 
-    age = age or 35
-    age_discount = -0.03 if 30 <= age <= 45 else 0.0
-    if age < 25: age_discount = 0.12
-    if age > 60: age_discount = 0.06
+    age = age or rt.default_age
+    age_discount = rt.age_disc(age)
 
     si = float(sum_insured) if sum_insured else 0.0
     ded = float(deductible) if deductible else 0.0
-    deductible_factor = 0.9 if ded >= 20000 else 0.95 if ded >= 10000 else 1.0
+    deductible_factor = rt.deductible_factor(ded)
 
-    add_on_catalog = {"asistencia vial": 300.0, "auto sustituto": 450.0, "llantas": 250.0, "cristales": 280.0}
-    add_ons_total = sum(add_on_catalog.get(_norm(x), 0.0) for x in (add_ons or []))
+    add_ons_total = rt.add_ons_total(add_ons)
 
     premium = base_premium
     if si:
-        premium *= min(max(si / 300000.0, 0.6), 3.0)
+        premium *= rt.sum_insured_factor(si)
 
     premium *= lcm * risk_factor * terr_factor * deductible_factor * (1.0 + age_discount)
     premium += add_ons_total
 
-    taxes = premium * 0.16
-    broker_commission = premium * 0.10
+    taxes = premium * rt.tax_rate
+    broker_commission = premium * rt.broker_rate
     total = round(premium + taxes + broker_commission, 2)
 
     return {
@@ -381,7 +485,99 @@ def calc_premium(
         "taxes": round(taxes, 2),
         "broker_commission": round(broker_commission, 2),
         "total_premium": total,
-        "currency": "MXN",
+        "currency": rt.currency,
+        "rating_version": rt.version,
+    }
+
+
+class PremiumScenario(BaseModel):
+    product_code: str = ""
+    sum_insured: float = 0.0
+    deductible: float = 0.0
+    age: int = 0
+    risk_class: str = ""
+    territory: str = ""
+    add_ons: List[str] = []
+
+
+def _quote_matrix(scen: List[Dict], rt: RatingTables) -> "np.ndarray":
+    """Misma fórmula que calc_premium, vectorizada sobre todos los escenarios."""
+    base = np.array([rt.base_premium(x["product_code"]) for x in scen])
+    risk = np.array([rt.risk_factor(x["risk_class"])[1] for x in scen])
+    terr = np.array([rt.territory_factor(x["territory"])[1] for x in scen])
+    add_on_tot = np.array([rt.add_ons_total(x["add_ons"]) for x in scen])
+    si = np.array([float(x["sum_insured"] or 0.0) for x in scen])
+    ded = np.array([float(x["deductible"] or 0.0) for x in scen])
+    age = np.array([int(x["age"] or rt.default_age) for x in scen])
+
+    age_disc = np.asarray(rt.age_discount)[np.clip(age, 0, len(rt.age_discount) - 1)]
+    ded_f = np.asarray(rt.ded_factors)[np.searchsorted(rt.ded_thresholds, ded, side="right")]
+    si_f = np.where(si > 0, np.clip(si / rt.si_reference, rt.si_min_factor, rt.si_max_factor), 1.0)
+
+    premium = base * si_f
+    premium = premium * (rt.lcm * risk * terr * ded_f * (1.0 + age_disc))
+    premium = premium + add_on_tot
+    return premium + premium * rt.tax_rate + premium * rt.broker_rate
+
+
+@mcp.tool()
+def calc_premium_batch(
+    product_code: str = "",
+    scenarios: List[PremiumScenario] = [],
+    sum_insured: List[float] = [],
+    deductible: List[float] = [],
+    territory: List[str] = [],
+    add_on_sets: List[List[str]] = [],
+    age: int = 0,
+    risk_class: str = "",
+) -> dict:
+    """
+    Cotiza muchos escenarios en una sola llamada y devuelve una tabla comparativa.
+
+    - Rejilla: combina todas las listas sum_insured × deductible × territory × add_on_sets
+      (una lista vacía = valor por defecto) sobre product_code/age/risk_class.
+    - 'scenarios': escenarios explícitos; los campos vacíos heredan los valores base.
+    """
+    base = {
+        "product_code": product_code, "sum_insured": 0.0, "deductible": 0.0,
+        "age": age, "risk_class": risk_class, "territory": "", "add_ons": [],
+    }
+    scen: List[Dict] = []
+    if sum_insured or deductible or territory or add_on_sets or not scenarios:
+        for si, ded, terr, adds in itertools.product(
+            sum_insured or [0.0], deductible or [0.0], territory or [""], add_on_sets or [[]]
+        ):
+            scen.append({**base, "sum_insured": si, "deductible": ded, "territory": terr, "add_ons": adds or []})
+    for sc in scenarios:
+        d = sc.model_dump() if isinstance(sc, PremiumScenario) else dict(sc)
+        scen.append({**base, **{k: v for k, v in d.items() if v}})
+    if not any(x["product_code"] for x in scen):
+        raise ValueError("product_code requerido (general o por escenario)")
+    if len(scen) > MAX_BATCH_SCENARIOS:
+        raise ValueError(f"demasiados escenarios ({len(scen)} > {MAX_BATCH_SCENARIOS})")
+
+    rt = RATING.current()
+    totals = _quote_matrix(scen, rt)
+    rows = [[
+        i,
+        x["product_code"],
+        float(x["sum_insured"] or 0.0) or None,
+        float(x["deductible"] or 0.0) or None,
+        rt.territory_factor(x["territory"])[0] or None,
+        rt.risk_factor(x["risk_class"])[0] or None,
+        int(x["age"] or rt.default_age),
+        x["add_ons"] or [],
+        round(float(t), 2),
+    ] for i, (x, t) in enumerate(zip(scen, totals))]
+    cheapest = int(np.argmin(totals)) if len(scen) else None
+
+    return {
+        "columns": ["#", "product_code", "sum_insured", "deductible", "territory",
+                    "risk_class", "age", "add_ons", "total_premium"],
+        "rows": rows,
+        "cheapest": cheapest,
+        "currency": rt.currency,
+        "rating_version": rt.version,
     }
 
 
@@ -407,40 +603,48 @@ def create_customer(
         from datetime import date
         bd = date(y, m, d)
 
-    with db() as conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-        cur.execute("""
-          SELECT id, name, email, phone
-          FROM customer
-          WHERE lower(email)=lower(%s) OR (%s <> '' AND phone=%s)
-          LIMIT 1
-        """, (em, ph, ph))
+    with ROUTER.write() as conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+        STATEMENTS.execute(cur, "create_customer.duplicate", Q.CUSTOMER_DUPLICATE, {"email": em, "phone": ph})
         existing = cur.fetchone()
         if existing:
             return {"customer": existing, "duplicate": True}
 
         new_id = str(uuid.uuid4())
-        cur.execute("""
-          INSERT INTO customer (id, name, email, phone)
-          VALUES (%s, %s, %s, %s)
-          RETURNING id, name, email, phone
-        """, (new_id, nm, em, ph))
+        STATEMENTS.execute(cur, "create_customer.insert", Q.CUSTOMER_INSERT, {"id": new_id, "name": nm, "email": em, "phone": ph})
         cust = cur.fetchone()
 
-        # perfil opcional si quieres guardarlo aparte
+        # perfil opcional (tabla creada por la migración 0005)
         if any([rfc, bd, address]):
-            cur.execute("""
-              CREATE TABLE IF NOT EXISTS customer_profile(
-                customer_id uuid PRIMARY KEY REFERENCES customer(id) ON DELETE CASCADE,
-                rfc text, birth_date date, address text
-              )
-            """)
-            cur.execute("""
-              INSERT INTO customer_profile (customer_id, rfc, birth_date, address)
-              VALUES (%s, %s, %s, %s)
-            """, (cust["id"], rfc or None, bd, address or None))
+            STATEMENTS.execute(cur, "create_customer.profile", Q.PROFILE_INSERT, {"cid": cust["id"], "rfc": rfc or None, "bd": bd, "address": address or None})
 
+    CACHE.invalidate(f"customer:{cust['id']}")
     return {"customer": cust, "duplicate": False}
 
+def _bulk_import(importer, content: str, fmt: str) -> dict:
+    with ROUTER.write() as conn:
+        res = importer(conn, iter_records(io.StringIO(content), fmt))
+    # Muchas entidades cambiaron a la vez: más simple vaciar la caché local
+    CACHE.clear()
+    return res
+
+@mcp.tool()
+def create_customers_bulk(content: str, fmt: str = "auto") -> dict:
+    """
+    Importa muchos clientes de una vez (CSV con encabezado o JSONL) vía COPY.
+    Campos: name, email, phone, rfc, birth_date, address. Idempotente por email/phone.
+    """
+    return _bulk_import(import_customers, content, fmt)
+
+@mcp.tool()
+def create_policies_bulk(content: str, fmt: str = "auto") -> dict:
+    """
+    Importa muchas pólizas (CSV con encabezado o JSONL) vía COPY.
+    Campos: customer_id o customer_email, product_code, start_date, term_months,
+    premium_monthly, status|activate, coverages (lista JSON). Idempotente por
+    (cliente, producto, inicio).
+    """
+    return _bulk_import(import_policies, content, fmt)
+
 if __name__ == "__main__":
     # FastMCP via STDIO. Compatible con ADK MCPToolset.
     mcp.run()
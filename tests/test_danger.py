@@ -0,0 +1,42 @@
+"""Ruta rápida de emergencia: qué mensajes cuentan como peligro inmediato."""
+
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+# Se carga el archivo directo: el paquete help_agent importa el agente ADK al importarse
+_PATH = Path(__file__).resolve().parents[1] / "agents" / "help_agent" / "danger.py"
+_spec = importlib.util.spec_from_file_location("help_agent_danger", _PATH)
+danger = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(danger)
+
+
+@pytest.mark.parametrize("text", [
+    "Me está golpeando, no sé qué hacer",
+    "Mi esposo me está amenazando y grita",
+    "Mi pareja tiene un cuchillo en la mano",
+    "Trae una pistola",
+    "Me amenaza con matarme ahorita",
+    "Me quiere matar",
+    "Está afuera de mi casa gritando",
+    "Están pateando la puerta",
+    "Me tiene encerrada en el cuarto",
+    "Estoy sangrando",
+    "¡Socorro!",
+])
+def test_detects_immediate_danger(text):
+    assert danger.detect_immediate_danger(text)
+
+
+@pytest.mark.parametrize("text", [
+    "Corté la verdura con un cuchillo",
+    "Mi mamá está aquí conmigo en casa, me siento mejor",
+    "jugamos al ahorcado",
+    "Pedí auxilio al DIF el año pasado",
+    "Hace dos años mi ex me amenazó con un cuchillo",
+    "¿Qué hago si me siento triste?",
+    "",
+])
+def test_ignores_past_or_unrelated_mentions(text):
+    assert not danger.detect_immediate_danger(text)
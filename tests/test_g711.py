@@ -0,0 +1,35 @@
+"""Regresión del códec G.711: las tablas deben coincidir con la referencia escalar."""
+
+import numpy as np
+
+from voice import g711
+
+
+def test_encode_table_matches_scalar_reference():
+    samples = np.arange(-32768, 32768, dtype=np.int32)
+    expected = bytes(g711._linear2ulaw(int(s)) for s in samples)
+    assert g711.encode_array(samples.astype(np.int16)) == expected
+
+
+def test_decode_table_matches_scalar_reference():
+    expected = np.array([g711._mulaw_byte_to_linear(b) for b in range(256)], dtype="<i2")
+    assert g711.decode(bytes(range(256))) == expected.tobytes()
+
+
+def test_silence_encodes_to_silence_byte():
+    assert g711.encode(b"\0\0") == bytes([g711.SILENCE])
+    assert g711.decode(bytes([g711.SILENCE])) == b"\0\0"
+
+
+def test_small_samples_stay_in_segment_zero():
+    # |x| < 124 es el segmento 0: la ida y vuelta no se aleja más que un paso
+    samples = np.arange(-123, 124, dtype=np.int16)
+    back = g711.decode_array(g711.encode_array(samples)).astype(np.int32)
+    assert np.abs(back - samples).max() <= 8
+
+
+def test_every_code_round_trips():
+    codes = bytes(range(256))
+    # 0x7F y 0xFF son ambos cero; el codificador elige 0xFF
+    again = g711.encode(g711.decode(codes))
+    assert all(a == b or {a, b} == {0x7F, 0xFF} for a, b in zip(again, codes))
@@ -0,0 +1,50 @@
+"""JitterBuffer: reordenamiento, relleno de huecos con silencio y descarte de frames atrasados."""
+
+from voice.g711 import SILENCE
+from voice.inbound import JitterBuffer
+
+
+def _frame(n: int) -> bytes:
+    return bytes([n]) * 160
+
+
+def test_in_order_frames_pass_through():
+    jb = JitterBuffer(window=3)
+    assert jb.push(1, _frame(1)) == [_frame(1)]
+    assert jb.push(2, _frame(2)) == [_frame(2)]
+    assert jb.stats() == {"reordered": 0, "filled": 0, "late": 0, "held": 0}
+
+
+def test_reordered_frame_is_released_in_order():
+    jb = JitterBuffer(window=3)
+    jb.push(1, _frame(1))
+    assert jb.push(3, _frame(3)) == []
+    assert jb.push(2, _frame(2)) == [_frame(2), _frame(3)]
+    assert jb.stats()["reordered"] == 1
+
+
+def test_gap_is_filled_with_silence_after_window():
+    jb = JitterBuffer(window=2)
+    jb.push(1, _frame(1))
+    assert jb.push(3, _frame(3)) == []
+    assert jb.push(4, _frame(4)) == []
+    # tercer frame posterior esperando: el 2 se da por perdido
+    assert jb.push(5, _frame(5)) == [bytes([SILENCE]) * 160, _frame(3), _frame(4), _frame(5)]
+    assert jb.stats()["filled"] == 1
+
+
+def test_late_and_duplicate_frames_are_dropped():
+    jb = JitterBuffer(window=1)
+    jb.push(1, _frame(1))
+    jb.push(3, _frame(3))
+    jb.push(4, _frame(4))  # se rellena el 2
+    assert jb.push(2, _frame(2)) == []
+    assert jb.push(4, _frame(4)) == []
+    assert jb.stats()["late"] == 2
+
+
+def test_long_gap_fill_is_capped():
+    jb = JitterBuffer(window=0, max_fill=5)
+    jb.push(1, _frame(1))
+    out = jb.push(100, _frame(100))
+    assert out == [bytes([SILENCE]) * 160] * 5 + [_frame(100)]
@@ -0,0 +1,60 @@
+"""VAD de fin de turno con frames μ-law sintéticos (silencio → tono → silencio)."""
+
+import numpy as np
+
+from voice import g711
+from voice.vad import FRAME_MS, VoiceActivityDetector
+
+RATE = 8000
+FRAME = RATE * FRAME_MS // 1000
+
+
+def _frames(*parts):
+    """parts: (n_frames, amplitud); ruido de fondo bajo y tono de 300 Hz."""
+    rng = np.random.default_rng(7)
+    chunks = []
+    t0 = 0
+    for n, amp in parts:
+        t = np.arange(t0, t0 + n * FRAME) / RATE
+        x = rng.normal(0, 20, len(t)) + amp * np.sin(2 * np.pi * 300 * t)
+        chunks.append(x)
+        t0 += n * FRAME
+    x = np.clip(np.concatenate(chunks), -32768, 32767).astype(np.int16)
+    ulaw = g711.encode_array(x)
+    return [ulaw[i:i + FRAME] for i in range(0, len(ulaw), FRAME)]
+
+
+def _events(vad, frames):
+    out = []
+    for f in frames:
+        for ev, t in vad.process_mulaw(f):
+            out.append((ev, round(t * 1000) // FRAME_MS))  # frames procesados al emitir
+    return out
+
+
+def test_speech_start_and_end_of_turn_frames():
+    vad = VoiceActivityDetector(rate=RATE, min_speech_ms=120, hangover_ms=600)
+    events = _events(vad, _frames((50, 0), (50, 8000), (60, 0)))
+    # inicio: tras min_speech_frames de tono; fin: tras hangover_frames de silencio
+    assert events == [
+        ("start", 50 + vad.min_speech_frames),
+        ("end", 100 + vad.hangover_frames),
+    ]
+    assert not vad.speaking
+
+
+def test_short_pause_does_not_end_turn():
+    vad = VoiceActivityDetector(rate=RATE, min_speech_ms=120, hangover_ms=600)
+    events = _events(vad, _frames((50, 0), (30, 8000), (10, 0), (30, 8000), (60, 0)))
+    assert [ev for ev, _ in events] == ["start", "end"]
+    assert events[1][1] == 120 + vad.hangover_frames
+
+
+def test_click_shorter_than_min_speech_is_ignored():
+    vad = VoiceActivityDetector(rate=RATE, min_speech_ms=120, hangover_ms=600)
+    assert _events(vad, _frames((50, 0), (3, 8000), (50, 0))) == []
+
+
+def test_onset_covers_min_speech():
+    vad = VoiceActivityDetector(rate=RATE, min_speech_ms=130)
+    assert vad.onset_ms() == vad.min_speech_frames * FRAME_MS >= 130
@@ -0,0 +1,79 @@
+"""
+Benchmark del remuestreo polifásico (voice/resample.py) contra las funciones
+anteriores del puente (decimación sin filtro y retención de orden cero):
+tiempo por llamada y nivel de alias/imagen a la salida.
+
+    python -m tools.bench_resample
+"""
+
+import math
+import struct
+import time
+
+import numpy as np
+
+from voice.resample import StreamingResampler, resample
+
+
+def _legacy_decimate(pcm: bytes, factor: int) -> bytes:
+    # Implementación anterior del puente: 1 de cada N muestras, sin filtro
+    out = bytearray()
+    i = 0
+    n = len(pcm)
+    step = 2 * factor
+    while i + 2 <= n:
+        out += pcm[i:i + 2]
+        i += step
+    return bytes(out)
+
+
+def _legacy_upsample_zoh(pcm: bytes) -> bytes:
+    out = bytearray()
+    for (s,) in struct.iter_unpack("<h", pcm):
+        out += struct.pack("<h", s)
+        out += struct.pack("<h", s)
+    return bytes(out)
+
+
+def _rms_db(pcm: bytes) -> float:
+    x = np.frombuffer(pcm, dtype="<i2").astype(np.float64)
+    return 20 * math.log10(max(float(np.sqrt(np.mean(x * x))), 1e-9))
+
+
+def _band_db(pcm: bytes, rate: int, lo: float) -> float:
+    """Energía por encima de `lo` Hz respecto a la total, en dB."""
+    x = np.frombuffer(pcm, dtype="<i2").astype(np.float64)
+    spec = np.abs(np.fft.rfft(x * np.hanning(len(x)))) ** 2
+    freqs = np.fft.rfftfreq(len(x), 1.0 / rate)
+    return 10 * math.log10(max(spec[freqs > lo].sum() / (spec.sum() or 1.0), 1e-12))
+
+
+def _bench() -> None:
+    def timeit(fn, *args, n=50):
+        t = time.perf_counter()
+        for _ in range(n):
+            fn(*args)
+        return (time.perf_counter() - t) / n * 1000
+
+    sec24 = (np.sin(2 * np.pi * 5000 * np.arange(24000) / 24000) * 12000).astype("<i2").tobytes()
+    frame8 = (np.sin(2 * np.pi * 440 * np.arange(160) / 8000) * 12000).astype("<i2").tobytes()
+
+    print("24k→8k, 1 s de audio")
+    print(f"  anterior (decimación): {timeit(_legacy_decimate, sec24, 3):8.3f} ms")
+    print(f"  polifásico:            {timeit(resample, sec24, 24000, 8000):8.3f} ms")
+    # tono de 5 kHz: por encima de la Nyquist de 8k; sin filtro aparece como alias de 3 kHz
+    ref = _rms_db(sec24)
+    print(f"  nivel del tono 5 kHz a la salida: anterior {_rms_db(_legacy_decimate(sec24, 3)) - ref:+.1f} dB,"
+          f" polifásico {_rms_db(resample(sec24, 24000, 8000)) - ref:+.1f} dB")
+
+    print("8k→16k, frame de 20 ms")
+    rs = StreamingResampler(8000, 16000)
+    print(f"  anterior (ZOH):        {timeit(_legacy_upsample_zoh, frame8, n=2000) * 1000:8.1f} µs")
+    print(f"  polifásico (stream):   {timeit(rs.process, frame8, n=2000) * 1000:8.1f} µs")
+    sec8 = frame8 * 50
+    print(f"  imagen > 4 kHz: anterior {_band_db(_legacy_upsample_zoh(sec8), 16000, 4000):.1f} dB,"
+          f" polifásico {_band_db(resample(sec8, 8000, 16000), 16000, 4000):.1f} dB")
+
+
+if __name__ == "__main__":
+    _bench()
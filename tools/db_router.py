@@ -0,0 +1,297 @@
+"""
+Enrutador de conexiones PostgreSQL para los servidores MCP.
+
+- Un pool por DSN (primario y cada réplica); si se agota, se espera un hueco
+  hasta `wait` segundos.
+- Escrituras → primario. Lecturas → réplicas en round-robin; una réplica caída
+  o con retraso mayor a `max_lag` segundos se salta y, si no queda ninguna, se
+  lee del primario.
+- Lee-tus-escrituras: al confirmar una escritura se guarda el LSN del primario
+  para la sesión (MCP) que escribió; durante `sticky_seconds` sus lecturas solo
+  van a una réplica que ya lo reprodujo, o al primario.
+
+Sin réplicas configuradas todo va al primario (mismo comportamiento de antes,
+pero con conexiones reutilizadas).
+"""
+
+import itertools
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import psycopg2
+import psycopg2.extensions
+from psycopg2 import pool as pg_pool
+
+logger = logging.getLogger("db_router")
+
+# Segundos de retraso de la réplica (0 si no hay WAL pendiente de aplicar)
+LAG_SQL = """
+SELECT CASE
+  WHEN NOT pg_is_in_recovery() THEN 0
+  WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+  ELSE coalesce(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+# NULL en un servidor que no es réplica: ya tiene todo lo escrito
+CAUGHT_UP_SQL = "SELECT coalesce(pg_last_wal_replay_lsn() >= %s::pg_lsn, true)"
+
+
+class _Conn(psycopg2.extensions.connection):
+    """Conexión del pool; `ready` indica que ya pasó por setup()."""
+    ready = False
+
+
+def session_key() -> str:
+    """Id de la sesión MCP en curso ('' fuera de una petición → todo el proceso)."""
+    try:
+        from fastmcp.server.dependencies import get_context
+
+        return str(get_context().session_id or "")
+    except Exception:
+        return ""
+
+
+class Pool:
+    def __init__(self, name: str, dsn: str, minconn: int, maxconn: int,
+                 setup: Optional[Callable[[Any], None]] = None, wait: float = 10.0):
+        self.name = name
+        self.dsn = dsn
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.setup = setup
+        self.wait = wait
+        self._pool: Optional[pg_pool.ThreadedConnectionPool] = None
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        # estado de salud (lo actualiza el router)
+        self.down_until = 0.0
+        self.lag = 0.0
+        self.lag_checked = 0.0
+        self.served = 0
+
+    def _ensure(self) -> pg_pool.ThreadedConnectionPool:
+        # perezoso: una réplica caída al arrancar no impide levantar el servidor
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = pg_pool.ThreadedConnectionPool(
+                        self.minconn, self.maxconn, self.dsn, connection_factory=_Conn
+                    )
+        return self._pool
+
+    def get(self):
+        if not self._slots.acquire(timeout=self.wait):
+            raise pg_pool.PoolError(f"pool {self.name} agotado ({self.maxconn} conexiones)")
+        try:
+            conn = self._ensure().getconn()
+            if conn.closed:
+                self._pool.putconn(conn, close=True)
+                conn = self._pool.getconn()
+            if not conn.ready:
+                if self.setup is not None:
+                    self.setup(conn)
+                conn.commit()
+                conn.ready = True
+            return conn
+        except Exception:
+            self._slots.release()
+            raise
+
+    def put(self, conn, close: bool = False) -> None:
+        try:
+            if not close and conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+            self._pool.putconn(conn, close=close or bool(conn.closed))
+        except Exception as e:
+            logger.warning("No se pudo devolver conexión a %s: %s", self.name, e)
+        finally:
+            self._slots.release()
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.closeall()
+
+
+class DbRouter:
+    def __init__(
+        self,
+        primary_dsn: str,
+        replica_dsns: Sequence[str] = (),
+        *,
+        minconn: int = 1,
+        maxconn: int = 10,
+        max_lag: float = 5.0,
+        lag_check_interval: float = 2.0,
+        sticky_seconds: float = 10.0,
+        retry_after: float = 15.0,
+        wait: float = 10.0,
+        setup: Optional[Callable[[Any], None]] = None,
+    ):
+        self.primary = Pool("primary", primary_dsn, minconn, maxconn, setup, wait)
+        self.replicas = [
+            Pool(f"replica{i}", dsn, minconn, maxconn, setup, wait)
+            for i, dsn in enumerate(replica_dsns, start=1)
+        ]
+        self.max_lag = max_lag
+        self.lag_check_interval = lag_check_interval
+        self.sticky_seconds = sticky_seconds
+        self.retry_after = retry_after
+        self._sticky: Dict[str, Tuple[float, str]] = {}  # sesión → (expira, LSN)
+        self._sticky_lock = threading.Lock()
+        self._rr = itertools.count()
+        self.fallbacks = 0
+
+    @classmethod
+    def from_env(cls, primary_dsn: str, replica_dsns: str = "", prefix: str = "DB_",
+                 setup: Optional[Callable[[Any], None]] = None) -> "DbRouter":
+        """Crea el router con la configuración {prefix}POOL_MIN/MAX, REPLICA_MAX_LAG, STICKY_SECONDS."""
+        def env(name: str, default: str) -> str:
+            return os.getenv(prefix + name) or os.getenv("DB_" + name) or default
+
+        return cls(
+            primary_dsn,
+            [d.strip() for d in (replica_dsns or "").split(",") if d.strip()],
+            minconn=int(env("POOL_MIN", "1")),
+            maxconn=int(env("POOL_MAX", "10")),
+            max_lag=float(env("REPLICA_MAX_LAG", "5")),
+            sticky_seconds=float(env("STICKY_SECONDS", "10")),
+            setup=setup,
+        )
+
+    # ------------------------------ escrituras ------------------------------
+
+    @contextmanager
+    def write(self, session: Optional[str] = None) -> Iterator[Any]:
+        """Conexión al primario; confirma al salir (o revierte si hubo error)."""
+        with self._use(self.primary, self.primary.get()) as conn:
+            yield conn
+            conn.commit()
+            if self.replicas:
+                self._remember_write(conn, session_key() if session is None else session)
+
+    def _remember_write(self, conn, session: str) -> None:
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_current_wal_lsn()::text")
+                lsn = cur.fetchone()[0]
+            conn.commit()
+        except Exception as e:
+            logger.warning("No se pudo leer el LSN del primario: %s", e)
+            return
+        now = time.monotonic()
+        with self._sticky_lock:
+            for k in [k for k, (exp, _) in self._sticky.items() if exp < now]:
+                del self._sticky[k]
+            self._sticky[session] = (now + self.sticky_seconds, lsn)
+
+    # ------------------------------- lecturas -------------------------------
+
+    @contextmanager
+    def read(self, session: Optional[str] = None) -> Iterator[Any]:
+        """Conexión para solo lectura (réplica si hay una al día, si no el primario)."""
+        pool, conn = self._pick_replica(session_key() if session is None else session)
+        if conn is None:
+            pool, conn = self.primary, self.primary.get()
+        with self._use(pool, conn) as c:
+            yield c
+            c.commit()
+
+    def _sticky_lsn(self, session: str) -> Optional[str]:
+        entry = self._sticky.get(session)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry[1]
+
+    def _pick_replica(self, session: str) -> Tuple[Pool, Any]:
+        if not self.replicas:
+            return self.primary, None
+        lsn = self._sticky_lsn(session)
+        start = next(self._rr)
+        now = time.monotonic()
+        for i in range(len(self.replicas)):
+            pool = self.replicas[(start + i) % len(self.replicas)]
+            if pool.down_until > now:
+                continue
+            stale = now - pool.lag_checked >= self.lag_check_interval
+            if not stale and pool.lag > self.max_lag:
+                continue
+            try:
+                conn = pool.get()
+            except pg_pool.PoolError:
+                continue
+            except Exception as e:
+                self._mark_down(pool, e)
+                continue
+            try:
+                if stale and not self._lag_ok(pool, conn):
+                    pool.put(conn)
+                    continue
+                if lsn and not self._caught_up(conn, lsn):
+                    pool.put(conn)
+                    continue
+            except Exception as e:
+                pool.put(conn, close=True)
+                self._mark_down(pool, e)
+                continue
+            return pool, conn
+        self.fallbacks += 1
+        return self.primary, None
+
+    def _lag_ok(self, pool: Pool, conn) -> bool:
+        with conn.cursor() as cur:
+            cur.execute(LAG_SQL)
+            lag = float(cur.fetchone()[0] or 0)
+        conn.commit()
+        was_ok = pool.lag <= self.max_lag
+        pool.lag, pool.lag_checked = lag, time.monotonic()
+        if was_ok and lag > self.max_lag:
+            logger.warning("%s con %.1fs de retraso; lecturas al primario", pool.name, lag)
+        elif not was_ok and lag <= self.max_lag:
+            logger.info("%s al día de nuevo (%.1fs)", pool.name, lag)
+        return lag <= self.max_lag
+
+    def _caught_up(self, conn, lsn: str) -> bool:
+        with conn.cursor() as cur:
+            cur.execute(CAUGHT_UP_SQL, (lsn,))
+            ok = bool(cur.fetchone()[0])
+        conn.commit()
+        return ok
+
+    def _mark_down(self, pool: Pool, err: Exception) -> None:
+        logger.warning("%s no disponible (%s); reintento en %.0fs", pool.name, err, self.retry_after)
+        pool.down_until = time.monotonic() + self.retry_after
+
+    # -------------------------------- comunes -------------------------------
+
+    @contextmanager
+    def _use(self, pool: Pool, conn) -> Iterator[Any]:
+        broken = False
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            pool.served += 1
+            pool.put(conn, close=broken)
+
+    def stats(self) -> Dict[str, Any]:
+        pools: List[Pool] = [self.primary, *self.replicas]
+        return {
+            "pools": {p.name: {"served": p.served, "lag": round(p.lag, 3),
+                               "down": p.down_until > time.monotonic()} for p in pools},
+            "fallbacks": self.fallbacks,
+            "sticky_sessions": len(self._sticky),
+        }
+
+    def close(self) -> None:
+        for p in (self.primary, *self.replicas):
+            p.close()
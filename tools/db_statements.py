@@ -0,0 +1,156 @@
+"""
+Registro de sentencias preparadas para las conexiones del pool (db_router).
+
+Cada consulta de las tools (SQL con parámetros %(nombre)s) se prepara una vez
+por conexión con PREPARE y después se ejecuta con EXECUTE, así Postgres no
+vuelve a parsear/planificar el texto en cada llamada. Lleva además conteo y
+tiempos por sentencia (report()).
+
+DB_PREPARE=false desactiva PREPARE (p.ej. detrás de pgbouncer en modo
+transacción) y solo deja la medición.
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+PREPARE_ENABLED = os.getenv("DB_PREPARE", "true").lower() in ("1", "true", "yes")
+# Máximo de sentencias preparadas por conexión (las variantes de filtros/campos
+# de find_customer/list_policies generan varias); se libera la menos usada
+MAX_PER_CONN = int(os.getenv("DB_PREPARE_MAX_PER_CONN", "64"))
+
+# invalid_sql_statement_name / "cached plan must not change result type"
+_REPREPARE = ("26000", "0A000")
+
+_PARAM_RE = re.compile(r"%\((\w+)\)s|%%|%s")
+
+
+@lru_cache(maxsize=512)
+def to_positional(sql: str) -> Tuple[str, str, Tuple[str, ...]]:
+    """(nombre de sentencia, SQL con $n, nombres de parámetros en orden)."""
+    names: List[str] = []
+
+    def sub(m: "re.Match[str]") -> str:
+        tok = m.group(0)
+        if tok == "%%":
+            return "%"
+        if tok == "%s":
+            raise ValueError("las sentencias preparadas usan parámetros con nombre %(x)s")
+        name = m.group(1)
+        if name not in names:
+            names.append(name)
+        return f"${names.index(name) + 1}"
+
+    text = _PARAM_RE.sub(sub, sql)
+    stmt = "mcp_" + hashlib.md5(sql.encode()).hexdigest()[:16]
+    return stmt, text, tuple(names)
+
+
+class _Stat:
+    __slots__ = ("calls", "total", "max", "prepares", "prepare_time", "errors")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.prepares = 0
+        self.prepare_time = 0.0
+        self.errors = 0
+
+
+class StatementRegistry:
+    def __init__(self, enabled: bool = PREPARE_ENABLED, max_per_conn: int = MAX_PER_CONN):
+        self.enabled = enabled
+        self.max_per_conn = max_per_conn
+        self._stats: Dict[str, _Stat] = {}
+        self._lock = threading.Lock()
+
+    def _stat(self, label: str) -> _Stat:
+        st = self._stats.get(label)
+        if st is None:
+            with self._lock:
+                st = self._stats.setdefault(label, _Stat())
+        return st
+
+    def _prepared(self, conn) -> Optional["OrderedDict[str, bool]"]:
+        prepared = getattr(conn, "prepared", None)
+        if prepared is None:
+            try:
+                prepared = conn.prepared = OrderedDict()
+            except AttributeError:
+                # conexión sin atributos propios (fuera del pool): sin PREPARE
+                return None
+        return prepared
+
+    def execute(self, cur, label: str, sql: str, params: Optional[Mapping[str, Any]] = None) -> None:
+        """Ejecuta `sql` en `cur` como sentencia preparada; deja los resultados en el cursor."""
+        st = self._stat(label)
+        prepared = self._prepared(cur.connection) if self.enabled else None
+        t0 = time.perf_counter()
+        try:
+            if prepared is None:
+                cur.execute(sql, params)
+            else:
+                stmt, text, names = to_positional(sql)
+                if prepared.get(stmt):
+                    prepared.move_to_end(stmt)
+                else:
+                    if stmt in prepared:
+                        # el esquema cambió el tipo del resultado: se vuelve a preparar
+                        del prepared[stmt]
+                        cur.execute(f"DEALLOCATE {stmt}")
+                    elif len(prepared) >= self.max_per_conn:
+                        old, _ = prepared.popitem(last=False)
+                        cur.execute(f"DEALLOCATE {old}")
+                    cur.execute(f"PREPARE {stmt} AS {text}")
+                    prepared[stmt] = True
+                    st.prepares += 1
+                    t1 = time.perf_counter()
+                    st.prepare_time += t1 - t0
+                    t0 = t1
+                if names:
+                    values = [params[n] for n in names]  # type: ignore[index]
+                    cur.execute(f"EXECUTE {stmt} ({', '.join(['%s'] * len(values))})", values)
+                else:
+                    cur.execute(f"EXECUTE {stmt}")
+        except Exception as e:
+            st.errors += 1
+            code = getattr(e, "pgcode", None)
+            if prepared is not None and code in _REPREPARE:
+                stmt = to_positional(sql)[0]
+                if code == "26000":
+                    prepared.pop(stmt, None)       # ya no existe en el servidor
+                elif stmt in prepared:
+                    prepared[stmt] = False         # DEALLOCATE + PREPARE la próxima vez
+            raise
+        dt = time.perf_counter() - t0
+        st.calls += 1
+        st.total += dt
+        if dt > st.max:
+            st.max = dt
+
+    def report(self) -> List[Dict[str, Any]]:
+        """Conteo y tiempos por sentencia, de mayor a menor tiempo total."""
+        out = []
+        for label, st in list(self._stats.items()):
+            out.append({
+                "statement": label,
+                "calls": st.calls,
+                "total_ms": round(st.total * 1000, 2),
+                "mean_ms": round(st.total * 1000 / st.calls, 3) if st.calls else 0.0,
+                "max_ms": round(st.max * 1000, 2),
+                "prepares": st.prepares,
+                "prepare_ms": round(st.prepare_time * 1000, 2),
+                "errors": st.errors,
+            })
+        out.sort(key=lambda r: r["total_ms"], reverse=True)
+        return out
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
@@ -0,0 +1,36 @@
+import os, sys, json, logging
+from pathlib import Path
+from dotenv import load_dotenv, find_dotenv
+from embed_client import embed_texts
+
+# Precalcula embeddings del KB de protocolos para search_protocols(semantic=True).
+# Uso: python tools/help_protocols_embed.py [protocols.json] [salida.json]
+
+load_dotenv(find_dotenv())
+logging.basicConfig(level=logging.INFO, format="%(levelname)s:%(message)s")
+logger = logging.getLogger("help_protocols_embed")
+
+_DATA_DIR = Path(__file__).resolve().parents[1] / "mcp_servers" / "help_mcp_server" / "data"
+PROTOCOLS_FILE = os.getenv("HELP_PROTOCOLS_FILE") or str(_DATA_DIR / "protocols.json")
+OUT_FILE = os.getenv("HELP_PROTOCOL_EMBEDDINGS_FILE") or str(_DATA_DIR / "protocol_embeddings.json")
+
+
+def protocol_text(p: dict) -> str:
+    return "\n".join([p.get("title", ""), " ".join(p.get("tags") or []), *(p.get("steps") or [])])
+
+
+def main(src: str = PROTOCOLS_FILE, dst: str = OUT_FILE):
+    with open(src, "r", encoding="utf-8") as f:
+        protocols = json.load(f) or []
+    texts = [protocol_text(p) for p in protocols]
+    vecs = embed_texts(texts, task_type="RETRIEVAL_DOCUMENT")
+    if len(vecs) != len(protocols):
+        raise RuntimeError(f"Embeddings devueltos {len(vecs)} != protocolos {len(protocols)}")
+    out = {p["id"]: v for p, v in zip(protocols, vecs)}
+    with open(dst, "w", encoding="utf-8") as f:
+        json.dump(out, f)
+    logger.info("Guardados %d embeddings en %s", len(out), dst)
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:3])
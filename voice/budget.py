@@ -0,0 +1,80 @@
+"""
+Presupuesto de concurrencia por proceso para el puente de voz.
+
+Cada worker atiende muchas llamadas en un solo event loop; las llamadas al
+proveedor de TTS y al agente se limitan con un semáforo por tipo
+(VOICE_TTS_CONCURRENCY, VOICE_AGENT_CONCURRENCY). Si no hay cupo dentro de
+VOICE_BUDGET_TIMEOUT segundos se lanza BudgetExceeded y el llamador degrada
+(frase en caché) en vez de encolar sin límite y congelar todas las llamadas.
+
+La conversión de audio (WAV → PCM → 8 kHz → μ-law) corre en AUDIO_EXECUTOR,
+un pool de hilos acotado (VOICE_AUDIO_WORKERS), fuera del event loop.
+"""
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+TTS_CONCURRENCY = int(os.getenv("VOICE_TTS_CONCURRENCY", "4"))
+AGENT_CONCURRENCY = int(os.getenv("VOICE_AGENT_CONCURRENCY", "8"))
+BUDGET_TIMEOUT = float(os.getenv("VOICE_BUDGET_TIMEOUT", "3"))
+AUDIO_WORKERS = int(os.getenv("VOICE_AUDIO_WORKERS", "2"))
+
+AUDIO_EXECUTOR = ThreadPoolExecutor(max_workers=AUDIO_WORKERS, thread_name_prefix="voice-audio")
+
+
+class BudgetExceeded(RuntimeError):
+    pass
+
+
+class Budget:
+    def __init__(self, name: str, limit: int, timeout: float = BUDGET_TIMEOUT):
+        self.name = name
+        self.limit = max(1, limit)
+        self.timeout = timeout
+        self._sem = asyncio.Semaphore(self.limit)
+        self.in_use = 0
+        self.waiting = 0
+        self.granted = 0
+        self.rejected = 0
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Ocupa un cupo (espera hasta `timeout`; si no, BudgetExceeded)."""
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._sem.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise BudgetExceeded(f"{self.name}: sin cupo tras {self.timeout:.1f}s ({self.limit} en uso)")
+        finally:
+            self.waiting -= 1
+        self.in_use += 1
+        self.granted += 1
+        try:
+            yield
+        finally:
+            self.in_use -= 1
+            self._sem.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "in_use": self.in_use,
+            "waiting": self.waiting,
+            "granted": self.granted,
+            "rejected": self.rejected,
+        }
+
+
+TTS_BUDGET = Budget("tts", TTS_CONCURRENCY)
+AGENT_BUDGET = Budget("agent", AGENT_CONCURRENCY)
+
+
+async def run_audio(fn: Callable[..., T], *args: Any) -> T:
+    """Ejecuta una conversión de audio en el pool acotado."""
+    return await asyncio.get_running_loop().run_in_executor(AUDIO_EXECUTOR, fn, *args)
@@ -0,0 +1,84 @@
+"""
+Códec G.711 μ-law por tablas (NumPy).
+
+Las tablas se generan una sola vez con las funciones escalares de referencia
+(las que usaba el puente, con el segmento 0 corregido: las muestras con
+|x| < 124 se codificaban en el segmento 7 y el silencio sonaba como un
+valor alto), así la salida coincide con la referencia escalar:
+  - decodificación: 256 entradas μ-law → PCM16
+  - codificación: 65536 entradas (muestra PCM16 vista como uint16) → μ-law
+Convertir un frame es entonces un solo indexado vectorizado.
+"""
+
+import numpy as np
+
+BIAS = 0x84  # 132
+CLIP = 32635
+SILENCE = 0xFF  # μ-law de la muestra 0
+
+
+def _linear2ulaw(sample: int) -> int:
+    # basado en ITU G.711 μ-law
+    sign = 0x80 if sample < 0 else 0x00
+    if sample < 0:
+        sample = -sample
+    if sample > CLIP:
+        sample = CLIP
+    sample = sample + BIAS
+    # calcular exponente (segmento 0 si ningún bit de 0x4000..0x100 está activo)
+    exponent = 0
+    mask = 0x4000
+    for exp in range(7, 0, -1):
+        if sample & mask:
+            exponent = exp
+            break
+        mask >>= 1
+    mantissa = (sample >> (exponent + 3)) & 0x0F
+    return ~(sign | (exponent << 4) | mantissa) & 0xFF
+
+
+def _mulaw_byte_to_linear(b: int) -> int:
+    u = (~b) & 0xFF
+    sign = u & 0x80
+    exponent = (u >> 4) & 0x07
+    mantissa = u & 0x0F
+    t = ((mantissa << 3) + BIAS) << exponent
+    sample = t - BIAS
+    return -sample if sign else sample
+
+
+def _build_tables():
+    dec = np.array(
+        [max(-32768, min(32767, _mulaw_byte_to_linear(b))) for b in range(256)], dtype="<i2"
+    )
+    # índice = bits de la muestra int16 como uint16 (0..32767 positivos, 32768.. negativos)
+    samples = np.arange(65536, dtype=np.int32)
+    samples[samples >= 32768] -= 65536
+    enc = np.array([_linear2ulaw(int(s)) for s in samples], dtype=np.uint8)
+    dec.setflags(write=False)
+    enc.setflags(write=False)
+    return dec, enc
+
+
+ULAW_DECODE, ULAW_ENCODE = _build_tables()
+
+
+def decode(mulaw: bytes) -> bytes:
+    """μ-law → PCM16 LE."""
+    return ULAW_DECODE[np.frombuffer(mulaw, dtype=np.uint8)].tobytes()
+
+
+def decode_array(mulaw: bytes) -> np.ndarray:
+    """μ-law → muestras int16 (para VAD/resampler sin pasar por bytes)."""
+    return ULAW_DECODE[np.frombuffer(mulaw, dtype=np.uint8)]
+
+
+def encode(pcm16: bytes) -> bytes:
+    """PCM16 LE → μ-law (un byte final impar se ignora)."""
+    n = len(pcm16) & ~1
+    return ULAW_ENCODE[np.frombuffer(pcm16, dtype="<u2", count=n // 2)].tobytes()
+
+
+def encode_array(samples: np.ndarray) -> bytes:
+    """Muestras int16 → μ-law."""
+    return ULAW_ENCODE[np.asarray(samples, dtype=np.int16).view(np.uint16)].tobytes()
@@ -0,0 +1,162 @@
+"""
+Audio entrante: de frames de Twilio (20 ms) a paquetes para el Live API.
+
+JitterBuffer ordena los frames por número de secuencia: los que llegan en
+orden salen de inmediato; si falta uno y ya hay VOICE_IN_JITTER_FRAMES
+posteriores esperando, el hueco se rellena con silencio μ-law (0xFF) y se
+sigue. Los frames atrasados se descartan.
+
+LiveUplink agrupa el PCM en paquetes de VOICE_IN_PACKET_MS (60–200 ms) y los
+envía desde una task propia por una cola acotada (VOICE_IN_QUEUE_PACKETS).
+Las señales activity_start/activity_end van por la misma cola, en orden con
+el audio. Si el Live se atrasa, la cola se llena y el lector del WebSocket
+espera (contrapresión hacia Twilio) en lugar de acumular memoria sin límite.
+"""
+
+import asyncio
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .g711 import SILENCE
+
+logger = logging.getLogger("voice.inbound")
+
+PACKET_MS = min(200, max(60, int(os.getenv("VOICE_IN_PACKET_MS", "100"))))
+QUEUE_PACKETS = int(os.getenv("VOICE_IN_QUEUE_PACKETS", "20"))
+JITTER_FRAMES = int(os.getenv("VOICE_IN_JITTER_FRAMES", "3"))
+# Huecos más largos (p.ej. reconexión) no se rellenan completos: se resincroniza
+MAX_FILL_FRAMES = 50
+
+
+class JitterBuffer:
+    def __init__(self, window: int = JITTER_FRAMES, max_fill: int = MAX_FILL_FRAMES):
+        self.window = window
+        self.max_fill = max_fill
+        self._next: Optional[int] = None
+        self._held: Dict[int, bytes] = {}
+        self._frame_len = 160
+        self.reordered = 0
+        self.filled = 0
+        self.late = 0
+
+    def push(self, seq: int, payload: bytes) -> List[bytes]:
+        """Frames listos para procesar, en orden (con silencio en los huecos)."""
+        if self._next is None:
+            self._next = seq
+        if seq < self._next or seq in self._held:
+            self.late += 1
+            return []
+        if seq != self._next:
+            self.reordered += 1
+        self._held[seq] = payload
+        self._frame_len = len(payload) or self._frame_len
+        out: List[bytes] = []
+        while self._held:
+            frame = self._held.pop(self._next, None)
+            if frame is not None:
+                out.append(frame)
+                self._next += 1
+                continue
+            if len(self._held) <= self.window:
+                break
+            # el frame esperado no llegó a tiempo: silencio y se continúa
+            nxt = min(self._held)
+            gap = nxt - self._next
+            self.filled += gap
+            out.extend([bytes([SILENCE]) * self._frame_len] * min(gap, self.max_fill))
+            self._next = nxt
+        return out
+
+    def stats(self) -> Dict[str, int]:
+        return {"reordered": self.reordered, "filled": self.filled, "late": self.late, "held": len(self._held)}
+
+
+class LiveUplink:
+    """Cola acotada hacia el Live API: ("audio", pcm) / ("start", b"") / ("end", b"")."""
+
+    def __init__(self, send: Callable[[str, bytes], Awaitable[Any]], rate: int,
+                 packet_ms: int = PACKET_MS, max_packets: int = QUEUE_PACKETS):
+        self._send = send
+        self.packet_bytes = rate * 2 * packet_ms // 1000
+        self._q: "asyncio.Queue[Tuple[str, bytes]]" = asyncio.Queue(maxsize=max(1, max_packets))
+        self._pending = b""
+        self._task: Optional["asyncio.Task[None]"] = None
+        self._stalled = False
+        self.packets = 0
+        self.audio_bytes = 0
+        self.stalls = 0
+        self.errors = 0
+        self.max_depth = 0
+
+    async def _put(self, kind: str, data: bytes) -> None:
+        if self._q.full():
+            if not self._stalled:
+                self.stalls += 1
+                logger.warning("Live API atrasado: cola de subida llena (%d paquetes); se frena la lectura.", self._q.maxsize)
+            self._stalled = True
+        else:
+            self._stalled = False
+        await self._q.put((kind, data))
+        self.max_depth = max(self.max_depth, self._q.qsize())
+
+    async def audio(self, pcm: bytes) -> None:
+        self._pending += pcm
+        while len(self._pending) >= self.packet_bytes:
+            packet, self._pending = self._pending[:self.packet_bytes], self._pending[self.packet_bytes:]
+            await self._put("audio", packet)
+
+    async def flush(self) -> None:
+        if self._pending:
+            packet, self._pending = self._pending, b""
+            await self._put("audio", packet)
+
+    async def activity_start(self, preroll: bytes = b"") -> None:
+        await self.flush()
+        await self._put("start", b"")
+        if preroll:
+            await self.audio(preroll)
+
+    async def activity_end(self) -> None:
+        # todo el audio del turno sale antes del fin de actividad
+        await self.flush()
+        await self._put("end", b"")
+
+    @property
+    def depth(self) -> int:
+        return self._q.qsize()
+
+    def start(self) -> "asyncio.Task[None]":
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return self._task
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+
+    async def _run(self) -> None:
+        while True:
+            kind, data = await self._q.get()
+            try:
+                await self._send(kind, data)
+                if kind == "audio":
+                    self.packets += 1
+                    self.audio_bytes += len(data)
+            except Exception as e:
+                self.errors += 1
+                logger.warning("Fallo enviando %s al Live API: %s", kind, e)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "packets": self.packets,
+            "audio_bytes": self.audio_bytes,
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "stalls": self.stalls,
+            "errors": self.errors,
+        }
@@ -0,0 +1,39 @@
+"""
+Normaliza los mensajes de la sesión Live al formato de eventos del responder.
+
+Con la detección de actividad propia (voice/vad.py) el Live API transcribe el
+audio del usuario (input_audio_transcription) y lo entrega en trozos dentro
+de server_content. Aquí se juntan y, cuando el turno del usuario terminó
+(transcripción `finished`, el modelo empieza a responder o cierra el turno),
+se emite un solo {"type": "transcript.completed", "text": ...}.
+Los eventos que ya son dict pasan tal cual.
+"""
+
+from typing import Any, Dict, List
+
+
+class TranscriptAssembler:
+    def __init__(self) -> None:
+        self._parts: List[str] = []
+
+    def feed(self, msg: Any) -> List[Dict[str, Any]]:
+        if isinstance(msg, dict):
+            return [msg]
+        sc = getattr(msg, "server_content", None)
+        if sc is None:
+            return []
+        tr = getattr(sc, "input_transcription", None)
+        text = getattr(tr, "text", None) if tr is not None else None
+        if text:
+            self._parts.append(text)
+        done = (
+            bool(getattr(tr, "finished", False))
+            or getattr(sc, "model_turn", None) is not None
+            or bool(getattr(sc, "generation_complete", False))
+            or bool(getattr(sc, "turn_complete", False))
+        )
+        if not (done and self._parts):
+            return []
+        full = "".join(self._parts).strip()
+        self._parts = []
+        return [{"type": "transcript.completed", "text": full}] if full else []
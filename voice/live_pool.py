@@ -0,0 +1,197 @@
+"""
+Sesiones Live pre-conectadas y modelo recordado, a nivel de proceso.
+
+Antes cada llamada probaba LIVE_MODEL_CANDIDATES en orden con un handshake
+completo por candidato. LiveSessionManager:
+  - recuerda el último modelo que conectó y lo intenta primero
+  - re-prueba cada VOICE_LIVE_REPROBE_S en segundo plano los candidatos
+    preferidos (anteriores en la lista) por si volvieron a estar disponibles
+  - mantiene VOICE_LIVE_POOL_SIZE sesiones ya conectadas (0 = sin pool);
+    una sesión con más de VOICE_LIVE_POOL_MAX_IDLE_S sin usar se cierra y
+    se reemplaza, para no entregar conexiones que el servidor ya cortó
+  - si aun así la sesión del pool resulta caída (falla el primer envío),
+    replace() la descarta y conecta otra
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Set
+
+logger = logging.getLogger("voice.live_pool")
+
+POOL_SIZE = int(os.getenv("VOICE_LIVE_POOL_SIZE", "1"))
+POOL_MAX_IDLE_S = float(os.getenv("VOICE_LIVE_POOL_MAX_IDLE_S", "60"))
+REPROBE_S = float(os.getenv("VOICE_LIVE_REPROBE_S", "600"))
+# Espera entre reintentos del mantenimiento cuando ningún modelo conecta
+_RETRY_S = 5.0
+
+
+class LiveLease:
+    """Sesión Live abierta entregada a una llamada (cerrar con close())."""
+
+    def __init__(self, cm: Any, session: Any, model: str):
+        self.cm = cm
+        self.session = session
+        self.model = model
+        self.created = time.monotonic()
+        self.pooled = False  # entregada desde el pool (ya conectada)
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.created
+
+    async def close(self) -> None:
+        try:
+            await self.cm.__aexit__(None, None, None)
+        except Exception as e:
+            logger.debug("Error cerrando sesión Live (%s): %s", self.model, e)
+
+
+class LiveSessionManager:
+    def __init__(self, client: Any, candidates: List[str], config: Callable[[], Any],
+                 pool_size: int = POOL_SIZE, max_idle: float = POOL_MAX_IDLE_S, reprobe: float = REPROBE_S):
+        self.client = client
+        self.candidates = list(candidates)
+        self.config = config
+        self.pool_size = max(0, pool_size)
+        self.max_idle = max_idle
+        self.reprobe = reprobe
+        self.model: Optional[str] = None
+        self._probed_at = 0.0
+        self._idle: Deque[LiveLease] = deque()
+        self._wake = asyncio.Event()
+        self._task: Optional["asyncio.Task[None]"] = None
+        self._closing: Set["asyncio.Task[None]"] = set()  # referencias: que no se recolecten antes de cerrar
+        self.pool_hits = 0
+        self.pool_misses = 0
+        self.stale_leases = 0
+        self.connect_failures = 0
+
+    async def _connect(self, model: str) -> LiveLease:
+        cm = self.client.aio.live.connect(model=model, config=self.config())
+        session = await cm.__aenter__()
+        return LiveLease(cm, session, model)
+
+    async def _connect_any(self) -> LiveLease:
+        order = ([self.model] if self.model else []) + [c for c in self.candidates if c != self.model]
+        last_err: Optional[Exception] = None
+        for candidate in order:
+            try:
+                t0 = time.perf_counter()
+                lease = await self._connect(candidate)
+                if candidate != self.model:
+                    logger.info("Live model elegido: %s (%.2fs)", candidate, time.perf_counter() - t0)
+                    self.model = candidate
+                    self._probed_at = time.monotonic()
+                return lease
+            except Exception as e:
+                last_err = e
+                self.connect_failures += 1
+                logger.warning("Fallo conectando con %s: %s", candidate, e)
+        self.model = None
+        raise RuntimeError(f"No se pudo abrir Live con ninguno de: {', '.join(self.candidates)}; ultimo error: {last_err}")
+
+    async def _probe_preferred(self) -> None:
+        """Prueba los candidatos anteriores al modelo actual; si uno conecta, pasa a ser el elegido."""
+        self._probed_at = time.monotonic()
+        if self.model not in self.candidates:
+            return
+        for candidate in self.candidates[: self.candidates.index(self.model)]:
+            try:
+                lease = await self._connect(candidate)
+            except Exception as e:
+                logger.debug("Re-prueba de %s falló: %s", candidate, e)
+                continue
+            logger.info("Live model preferido disponible otra vez: %s (antes %s)", candidate, self.model)
+            self.model = candidate
+            self._discard_idle()
+            self._idle.append(lease)
+            return
+
+    def _discard_idle(self, max_idle: Optional[float] = None) -> None:
+        """Cierra las sesiones del pool de otro modelo o con más de `max_idle` s."""
+        keep: Deque[LiveLease] = deque()
+        while self._idle:
+            lease = self._idle.popleft()
+            if lease.model == self.model and (max_idle is None or lease.age <= max_idle):
+                keep.append(lease)
+            else:
+                self._close_later(lease)
+        self._idle = keep
+
+    def _close_later(self, lease: LiveLease) -> None:
+        task = asyncio.create_task(lease.close())
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def acquire(self) -> LiveLease:
+        """Sesión lista para la llamada: del pool si hay una vigente; si no, se conecta."""
+        self._discard_idle(self.max_idle)
+        self._wake.set()  # el mantenimiento repone lo que se entrega
+        if self._idle:
+            self.pool_hits += 1
+            lease = self._idle.popleft()
+            lease.pooled = True
+            return lease
+        self.pool_misses += 1
+        return await self._connect_any()
+
+    async def replace(self, lease: LiveLease) -> LiveLease:
+        """Sesión que falló al primer envío (el servidor la cortó estando en el pool): se cambia por otra."""
+        self.stale_leases += 1
+        self._close_later(lease)
+        return await self._connect_any()
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._maintain())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+        while self._idle:
+            await self._idle.popleft().close()
+        if self._closing:
+            await asyncio.gather(*self._closing, return_exceptions=True)
+
+    async def _maintain(self) -> None:
+        while True:
+            try:
+                if self.model and self.reprobe > 0 and time.monotonic() - self._probed_at > self.reprobe:
+                    await self._probe_preferred()
+                self._discard_idle(self.max_idle)
+                while len(self._idle) < self.pool_size:
+                    self._idle.append(await self._connect_any())
+            except Exception as e:
+                logger.warning("Pool Live sin reponer: %s", e)
+                await asyncio.sleep(_RETRY_S)
+                continue
+            # despierta al entregar una sesión, antes de que las del pool caduquen o al tocar re-prueba
+            self._wake.clear()
+            timeout = self.max_idle / 2
+            if self.reprobe > 0:
+                timeout = min(timeout, self.reprobe)
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=max(1.0, timeout))
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            "pool_size": self.pool_size,
+            "idle": len(self._idle),
+            "idle_ages_s": [round(lease.age, 1) for lease in self._idle],
+            "pool_hits": self.pool_hits,
+            "pool_misses": self.pool_misses,
+            "stale_leases": self.stale_leases,
+            "connect_failures": self.connect_failures,
+            "seconds_since_probe": round(time.monotonic() - self._probed_at, 1) if self._probed_at else None,
+        }
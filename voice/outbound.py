@@ -0,0 +1,182 @@
+"""
+Envío de audio saliente a Twilio a ritmo de reproducción.
+
+MediaSender (uno por llamada) recibe μ-law 8 kHz de cualquier tamaño y:
+  - lo agrupa en mensajes de VOICE_OUT_FRAME_MS (múltiplo de 20 ms) con el
+    JSON/base64 ya armado al encolar (una codificación por mensaje, no por frame)
+  - los envía en tiempo real dejando solo VOICE_OUT_LEAD_MS de adelanto en el
+    buffer de Twilio, así un "clear" (barge-in) descarta poco audio ya enviado
+  - intercala los marks en su posición (límites de segmento)
+  - expone la profundidad de la cola (queued_ms) y estadísticas de envío
+  - si un envío falla (WebSocket cerrado) se detiene y descarta lo pendiente
+"""
+
+import asyncio
+import base64
+import json
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+logger = logging.getLogger("voice.outbound")
+
+BYTES_PER_MS = 8  # μ-law 8 kHz
+OUT_FRAME_MS = max(20, int(os.getenv("VOICE_OUT_FRAME_MS", "60")) // 20 * 20)
+OUT_LEAD_MS = int(os.getenv("VOICE_OUT_LEAD_MS", "200"))
+
+
+class MediaSender:
+    def __init__(self, send_text: Callable[[str], Awaitable[Any]], stream_sid: str,
+                 frame_ms: int = OUT_FRAME_MS, lead_ms: int = OUT_LEAD_MS):
+        self._send_text = send_text
+        self.stream_sid = stream_sid
+        self.frame_bytes = frame_ms * BYTES_PER_MS
+        self.lead = lead_ms / 1000.0
+        sid = json.dumps(stream_sid)
+        self._media_prefix = '{"event":"media","streamSid":' + sid + ',"media":{"payload":"'
+        self._queue: Deque[Tuple[str, str, int]] = deque()  # (tipo, mensaje, bytes de audio)
+        self._partial = b""
+        self._queued_bytes = 0
+        self._wake = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._play_until = 0.0  # instante (monotonic) en que termina el audio ya enviado
+        self._in_reply = False  # hay una respuesta en curso (entre su primer audio y el mark final)
+        self._task: Optional["asyncio.Task[None]"] = None
+        self.failed = False  # un envío falló: ya no se encola ni se envía nada
+        self.messages = 0
+        self.audio_bytes = 0
+        self.marks = 0
+        self.underruns = 0
+        self.clears = 0
+
+    # ------------------------------ productor ------------------------------
+    def _push(self, kind: str, msg: str, nbytes: int) -> None:
+        if self.failed:
+            return
+        self._queue.append((kind, msg, nbytes))
+        self._queued_bytes += nbytes
+        self._idle.clear()
+        self._wake.set()
+
+    def _push_audio(self, audio: bytes) -> None:
+        payload = base64.b64encode(audio).decode("ascii")
+        self._push("media", f'{self._media_prefix}{payload}"}}}}', len(audio))
+
+    def send_audio(self, ulaw: bytes) -> None:
+        """Encola audio; se envía en mensajes de frame_bytes (el resto espera al siguiente)."""
+        data = self._partial + ulaw
+        n = len(data) - len(data) % self.frame_bytes
+        for pos in range(0, n, self.frame_bytes):
+            self._push_audio(data[pos:pos + self.frame_bytes])
+        self._partial = data[n:]
+
+    def flush(self) -> None:
+        """Encola el audio parcial pendiente (fin de segmento)."""
+        if self._partial:
+            self._push_audio(self._partial)
+            self._partial = b""
+
+    def mark(self, name: str, last: bool = False) -> None:
+        """Mark tras el audio encolado hasta ahora (`last`: cierra la respuesta)."""
+        self.flush()
+        msg = json.dumps({"event": "mark", "streamSid": self.stream_sid, "mark": {"name": name}})
+        self._push("last_mark" if last else "mark", msg, 0)
+
+    @property
+    def queued_ms(self) -> int:
+        """Audio encolado que todavía no se envió a Twilio."""
+        return (self._queued_bytes + len(self._partial)) // BYTES_PER_MS
+
+    @property
+    def buffered_ms(self) -> int:
+        """Audio ya enviado que Twilio aún no termina de reproducir (estimado)."""
+        return max(0, int((self._play_until - time.monotonic()) * 1000))
+
+    async def drain(self) -> None:
+        """Espera a que todo lo encolado se haya enviado."""
+        self.flush()
+        await self._idle.wait()
+
+    async def clear(self) -> int:
+        """Descarta lo pendiente y pide a Twilio vaciar su buffer; devuelve ms descartados."""
+        dropped = self.queued_ms + self.buffered_ms
+        self._queue.clear()
+        self._partial = b""
+        self._queued_bytes = 0
+        self._play_until = 0.0
+        self._in_reply = False
+        self._idle.set()
+        self.clears += 1
+        await self._send_text(json.dumps({"event": "clear", "streamSid": self.stream_sid}))
+        return dropped
+
+    # ------------------------------ envío ----------------------------------
+    def start(self) -> "asyncio.Task[None]":
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return self._task
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+
+    async def _run(self) -> None:
+        while True:
+            if not self._queue:
+                self._idle.set()
+                self._wake.clear()
+                await self._wake.wait()
+                continue
+            kind, msg, nbytes = self._queue[0]
+            if kind == "media":
+                now = time.monotonic()
+                if self._play_until < now:
+                    if self._in_reply:
+                        self.underruns += 1  # Twilio se quedó sin audio a mitad de la respuesta
+                    self._play_until = now
+                wait = self._play_until - self.lead - now
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                    continue  # la cola pudo vaciarse (clear) mientras dormía
+            self._queue.popleft()
+            self._queued_bytes -= nbytes
+            try:
+                await self._send_text(msg)
+            except Exception as e:
+                # WebSocket caído: no tiene caso intentar el resto mensaje por mensaje
+                logger.warning("No se pudo enviar a Twilio (%s): %s; se descartan %d ms pendientes.",
+                               kind, e, self.queued_ms)
+                self.failed = True
+                self._queue.clear()
+                self._partial = b""
+                self._queued_bytes = 0
+                self._idle.set()
+                return
+            self.messages += 1
+            if kind == "media":
+                self.audio_bytes += nbytes
+                self._play_until += nbytes / (BYTES_PER_MS * 1000.0)
+                self._in_reply = True
+            else:
+                self.marks += 1
+                if kind == "last_mark":
+                    self._in_reply = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "messages": self.messages,
+            "audio_ms": self.audio_bytes // BYTES_PER_MS,
+            "marks": self.marks,
+            "queued_ms": self.queued_ms,
+            "buffered_ms": self.buffered_ms,
+            "underruns": self.underruns,
+            "clears": self.clears,
+            "failed": self.failed,
+        }
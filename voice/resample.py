@@ -0,0 +1,107 @@
+"""
+Remuestreo polifásico FIR (NumPy) con estado, para audio PCM16 mono.
+
+Filtro pasa-bajas sinc con ventana Kaiser, diseñado para la razón L/M
+(p.ej. 24k→8k: L=1, M=3; 8k→16k: L=2, M=1) y aplicado por fases: cada
+muestra de salida es un producto punto de K muestras de entrada. El
+resampler guarda las últimas K-1 muestras y la fase, de modo que procesar
+un audio por trozos da el mismo resultado que procesarlo completo (sin
+clics en las uniones).
+
+Benchmark contra las funciones anteriores del puente: tools/bench_resample.py.
+"""
+
+import math
+from functools import lru_cache
+from typing import Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Cruces por cero del sinc a cada lado (calidad vs costo) y atenuación Kaiser
+HALF_WIDTH = 8
+KAISER_BETA = 8.0
+ROLLOFF = 0.90  # corte al 90% de la Nyquist de la frecuencia menor
+
+
+@lru_cache(maxsize=16)
+def _design(up: int, down: int) -> Tuple[np.ndarray, int]:
+    """Filtro polifásico invertido: (fases[L, K], K)."""
+    factor = max(up, down)
+    taps = 2 * HALF_WIDTH * factor + 1
+    k = -(-taps // up)  # taps por fase
+    n = k * up
+    t = np.arange(n) - (n - 1) / 2.0
+    fc = ROLLOFF * 0.5 / factor  # ciclos por muestra en la tasa sobremuestreada
+    h = 2 * fc * np.sinc(2 * fc * t) * np.kaiser(n, KAISER_BETA)
+    h *= up / h.sum()  # ganancia unitaria en DC tras insertar ceros
+    # fase p usa h[p + k*L]; se invierte para hacer producto punto con la ventana
+    phases = h.reshape(k, up).T[:, ::-1].astype(np.float32)
+    phases.setflags(write=False)
+    return phases, k
+
+
+class StreamingResampler:
+    """Remuestrea PCM16 mono de src_hz a dst_hz por trozos."""
+
+    def __init__(self, src_hz: int, dst_hz: int):
+        g = math.gcd(int(src_hz), int(dst_hz))
+        self.src_hz, self.dst_hz = int(src_hz), int(dst_hz)
+        self.up, self.down = self.dst_hz // g, self.src_hz // g
+        self._phases, self._k = _design(self.up, self.down)
+        self._hist = np.zeros(self._k - 1, dtype=np.float32)
+        # posición (en muestras sobremuestreadas) de la próxima salida respecto a _hist[0]
+        self._pos = (self._k - 1) * self.up
+        self._odd = b""
+
+    @property
+    def passthrough(self) -> bool:
+        return self.up == self.down
+
+    @property
+    def delay(self) -> float:
+        """Retardo de grupo en segundos."""
+        return (self._k - 1) / 2.0 / self.src_hz
+
+    def process_array(self, x: np.ndarray) -> np.ndarray:
+        if self.passthrough:
+            return np.asarray(x, dtype=np.int16)
+        buf = np.concatenate((self._hist, np.asarray(x, dtype=np.float32)))
+        k, up, down = self._k, self.up, self.down
+        limit = len(buf) * up  # primera posición sin muestra de entrada disponible
+        if self._pos >= limit:
+            self._hist = buf[len(buf) - (k - 1):]
+            self._pos -= (len(buf) - (k - 1)) * up
+            return np.empty(0, dtype=np.int16)
+        pos = np.arange(self._pos, limit, down, dtype=np.int64)
+        idx, phase = np.divmod(pos, up)
+        windows = sliding_window_view(buf, k)[idx - (k - 1)]
+        y = np.einsum("nk,nk->n", windows, self._phases[phase], optimize=False)
+        consumed = len(buf) - (k - 1)
+        self._hist = buf[consumed:]
+        self._pos = int(pos[-1]) + down - consumed * up
+        return np.clip(np.rint(y), -32768, 32767).astype(np.int16)
+
+    def process(self, pcm16: bytes) -> bytes:
+        """PCM16 LE → PCM16 LE remuestreado (guarda un byte impar para el siguiente trozo)."""
+        if self.passthrough:
+            return pcm16
+        data = self._odd + pcm16
+        n = len(data) & ~1
+        self._odd = data[n:]
+        return self.process_array(np.frombuffer(data, dtype="<i2", count=n // 2)).tobytes()
+
+    def flush(self) -> bytes:
+        """Vacía la cola del filtro (fin del audio)."""
+        if self.passthrough:
+            return b""
+        tail = np.zeros(self._k // 2 + 1, dtype=np.float32)
+        return self.process_array(tail).tobytes()
+
+
+def resample(pcm16: bytes, src_hz: int, dst_hz: int) -> bytes:
+    """Remuestrea un audio completo (sin estado)."""
+    if src_hz == dst_hz:
+        return pcm16
+    rs = StreamingResampler(src_hz, dst_hz)
+    return rs.process(pcm16) + rs.flush()
@@ -0,0 +1,365 @@
+"""
+TTS de Gemini → μ-law 8 kHz para Twilio.
+
+`stream()` consume el audio conforme el proveedor lo genera
+(generate_content_stream), lo convierte por trozos (PCM → 8 kHz con el
+resampler con estado → μ-law) y entrega frames de 20 ms en cuanto están
+listos: el primer audio ya no depende del largo de la respuesta.
+`synthesize()` devuelve el audio completo (camino no-streaming).
+
+`pipeline()` parte la respuesta en oraciones/cláusulas (split_segments) y
+sintetiza las siguientes en paralelo mientras suena la actual, con una
+anticipación acotada (VOICE_TTS_LOOKAHEAD); el audio sale siempre en orden.
+
+Con una PhraseCache (voice/tts_cache.py) las frases ya sintetizadas salen
+de la caché sin llamar al proveedor.
+
+Nada bloquea el event loop: las peticiones usan el cliente async, la
+conversión de audio corre en el pool de voice/budget.py y cada petición
+ocupa un cupo de TTS_BUDGET; sin cupo se reproduce la frase `busy_text`
+desde la caché.
+"""
+
+import asyncio
+import base64
+import io
+import logging
+import os
+import re
+import struct
+import time
+import wave
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import numpy as np
+from google.genai import types
+
+from . import g711
+from .budget import TTS_BUDGET, BudgetExceeded, run_audio
+from .resample import StreamingResampler, resample
+from .tts_cache import PhraseCache
+
+logger = logging.getLogger("voice.tts")
+
+FRAME_BYTES = 160  # 20 ms de μ-law 8 kHz
+DEFAULT_RATE = 24000  # PCM L16 de los modelos TTS de Gemini
+
+# Segmentos que se sintetizan por adelantado mientras suena el actual
+LOOKAHEAD = int(os.getenv("VOICE_TTS_LOOKAHEAD", "2"))
+# Segmentos más cortos se unen al siguiente (prosodia); más largos se parten en comas
+SEGMENT_MIN_CHARS = int(os.getenv("VOICE_TTS_SEGMENT_MIN_CHARS", "25"))
+SEGMENT_MAX_CHARS = int(os.getenv("VOICE_TTS_SEGMENT_MAX_CHARS", "200"))
+
+_RATE_RE = re.compile(r"rate=(\d+)")
+_SENTENCE_RE = re.compile(r"(?<=[.!?…;:])\s+")
+_CLAUSE_RE = re.compile(r"(?<=,)\s+")
+
+
+def _to_mono16(frames: bytes, sampwidth: int, nch: int) -> bytes:
+    """PCM de 8/16/24 bits y 1-2 canales → PCM16 mono."""
+    if sampwidth == 1:
+        x = (np.frombuffer(frames, dtype=np.uint8).astype(np.int16) - 128) << 8
+    elif sampwidth == 3:
+        # toma los 2 bytes menos significativos de cada muestra (como antes)
+        n = len(frames) // 3
+        b = np.frombuffer(frames, dtype=np.uint8, count=n * 3).reshape(n, 3)
+        x = b[:, :2].copy().view("<i2").reshape(-1)
+    else:
+        x = np.frombuffer(frames, dtype="<i2", count=len(frames) // 2)
+    if nch == 2:
+        n = len(x) // 2
+        # mezcla a mono con división entera (mismo redondeo que antes)
+        x = (x[: n * 2].reshape(n, 2).astype(np.int32).sum(axis=1) // 2).astype(np.int16)
+    return x.astype("<i2", copy=False).tobytes()
+
+
+def _parts(resp: Any):
+    try:
+        return resp.candidates[0].content.parts or []
+    except Exception:
+        return []
+
+
+def _blob_of_part(part: Any) -> Tuple[bytes, Optional[str]]:
+    # Extrae bytes de audio (inline_data) y su mime_type si está presente
+    blob = getattr(part, "inline_data", None)
+    data = getattr(blob, "data", None)
+    if isinstance(data, str):
+        try:
+            data = base64.b64decode(data)
+        except Exception:
+            data = data.encode("utf-8")
+    return bytes(data or b""), getattr(blob, "mime_type", None)
+
+
+def _blob_of(resp: Any) -> Tuple[bytes, Optional[str]]:
+    parts = _parts(resp)
+    return _blob_of_part(parts[0]) if parts else (b"", None)
+
+
+def pcm_from_audio(raw: bytes, mime: Optional[str]) -> Tuple[bytes, int]:
+    """Audio completo (WAV o PCM L16) → (PCM16 mono, tasa)."""
+    if (mime or "").lower() in ("audio/wav", "audio/x-wav") or (raw[:4] == b"RIFF" and raw[8:12] == b"WAVE"):
+        with wave.open(io.BytesIO(raw), "rb") as wf:
+            sr = wf.getframerate()
+            frames = wf.readframes(wf.getnframes())
+            return _to_mono16(frames, wf.getsampwidth(), wf.getnchannels()), sr
+    m = _RATE_RE.search(mime or "")
+    return raw, int(m.group(1)) if m else DEFAULT_RATE
+
+
+def split_segments(text: str, min_chars: int = SEGMENT_MIN_CHARS, max_chars: int = SEGMENT_MAX_CHARS) -> List[str]:
+    """Parte una respuesta en oraciones (y en cláusulas si son muy largas)."""
+    pieces: List[str] = []
+    for sentence in _SENTENCE_RE.split((text or "").strip()):
+        if len(sentence) > max_chars:
+            pieces.extend(_CLAUSE_RE.split(sentence))
+        else:
+            pieces.append(sentence)
+    out: List[str] = []
+    for piece in pieces:
+        piece = piece.strip()
+        if not piece:
+            continue
+        # "Sr.", "Hola." o una cláusula corta suenan mejor junto con lo que sigue
+        if out and len(out[-1]) < min_chars:
+            out[-1] = f"{out[-1]} {piece}"
+        else:
+            out.append(piece)
+    return out
+
+
+class _StreamDecoder:
+    """Convierte trozos de audio (WAV o L16) a μ-law 8 kHz de forma incremental."""
+
+    def __init__(self) -> None:
+        self._head = b""
+        self._started = False
+        self._sampwidth = 2
+        self._nch = 1
+        self._block = 2
+        self._carry = b""
+        self._rs: Optional[StreamingResampler] = None
+
+    def _start(self, data: bytes, mime: Optional[str]) -> Optional[bytes]:
+        """Detecta el formato; devuelve los bytes PCM del trozo o None si falta cabecera."""
+        buf = self._head + data
+        if buf[:4] == b"RIFF" or (mime or "").lower() in ("audio/wav", "audio/x-wav"):
+            if len(buf) < 12:
+                self._head = buf
+                return None
+            pos, sr = 12, DEFAULT_RATE
+            while pos + 8 <= len(buf):
+                cid, size = buf[pos:pos + 4], struct.unpack("<I", buf[pos + 4:pos + 8])[0]
+                if cid == b"fmt ":
+                    if pos + 8 + 16 > len(buf):
+                        break  # fmt llegó a medias: se espera al siguiente trozo
+                    _, self._nch, sr, _, _, bits = struct.unpack("<HHIIHH", buf[pos + 8:pos + 24])
+                    self._sampwidth = max(1, bits // 8)
+                elif cid == b"data":
+                    self._rs = StreamingResampler(sr, 8000)
+                    self._block = self._sampwidth * self._nch
+                    self._started = True
+                    return buf[pos + 8:]
+                pos += 8 + size + (size & 1)  # los chunks RIFF se alinean a 2 bytes
+            self._head = buf  # cabecera incompleta
+            return None
+        m = _RATE_RE.search(mime or "")
+        self._rs = StreamingResampler(int(m.group(1)) if m else DEFAULT_RATE, 8000)
+        self._started = True
+        return buf
+
+    def feed(self, data: bytes, mime: Optional[str]) -> bytes:
+        if not self._started:
+            pcm = self._start(data, mime)
+            if pcm is None:
+                return b""
+        else:
+            pcm = data
+        pcm = self._carry + pcm
+        n = len(pcm) - len(pcm) % self._block
+        self._carry = pcm[n:]
+        mono = _to_mono16(pcm[:n], self._sampwidth, self._nch) if self._block != 2 else pcm[:n]
+        return g711.encode(self._rs.process(mono)) if self._rs else b""
+
+    def flush(self) -> bytes:
+        return g711.encode(self._rs.flush()) if self._rs else b""
+
+
+def _convert_full(raw: bytes, mime: Optional[str]) -> bytes:
+    pcm16, sr = pcm_from_audio(raw, mime)
+    return g711.encode(resample(pcm16, sr, 8000))
+
+
+class TtsEngine:
+    def __init__(self, client: Any, model: str, voice: str, cache: Optional[PhraseCache] = None,
+                 busy_text: Optional[str] = None):
+        self.client = client
+        self.model = model
+        self.voice = voice
+        self.cache = cache
+        self.busy_text = busy_text
+
+    def _config(self) -> types.GenerateContentConfig:
+        return types.GenerateContentConfig(
+            response_modalities=["AUDIO"],
+            speech_config=types.SpeechConfig(
+                voice_config=types.VoiceConfig(
+                    prebuilt_voice_config=types.PrebuiltVoiceConfig(voice_name=self.voice)
+                )
+            ),
+        )
+
+    async def synthesize(self, text: str) -> bytes:
+        """Audio completo en μ-law 8 kHz (de la caché si la hay)."""
+        if self.cache is None:
+            return await self._synthesize(text)
+        return await self.cache.get_or_create(text, self.voice, self.model, lambda: self._synthesize(text))
+
+    async def warm(self, phrases: List[str]) -> int:
+        """Precalienta la caché con frases fijas."""
+        if self.cache is None:
+            return 0
+        return await self.cache.warm(phrases, self.voice, self.model, self._synthesize)
+
+    async def busy_audio(self) -> bytes:
+        """Frase de degradación (solo desde la caché; vacío si no está)."""
+        if self.cache is None or not self.busy_text:
+            return b""
+        return await self.cache.get(self.busy_text, self.voice, self.model) or b""
+
+    async def _synthesize(self, text: str) -> bytes:
+        async with TTS_BUDGET.slot():
+            resp = await self.client.aio.models.generate_content(model=self.model, contents=text, config=self._config())
+        raw, mime = _blob_of(resp)
+        return await run_audio(_convert_full, raw, mime)
+
+    async def stream(self, text: str) -> AsyncIterator[bytes]:
+        """Frames μ-law 8 kHz (múltiplos de 20 ms) conforme llega el audio del proveedor."""
+        t0 = time.perf_counter()
+        keep = self.cache is not None and self.cache.cacheable(text)
+        if keep:
+            cached = await self.cache.get(text, self.voice, self.model)
+            if cached is not None:
+                yield cached
+                return
+        produced: List[bytes] = []
+        dec = _StreamDecoder()
+        pending = b""
+        first = True
+        try:
+            async with TTS_BUDGET.slot():
+                chunks = await self.client.aio.models.generate_content_stream(
+                    model=self.model, contents=text, config=self._config()
+                )
+                async for chunk in chunks:
+                    for part in _parts(chunk):
+                        data, mime = _blob_of_part(part)
+                        if not data:
+                            continue
+                        pending += await run_audio(dec.feed, data, mime)
+                        n = len(pending) - len(pending) % FRAME_BYTES
+                        if n:
+                            if first:
+                                logger.info("TTS primer audio en %.3fs (chars=%d)", time.perf_counter() - t0, len(text))
+                                first = False
+                            out, pending = pending[:n], pending[n:]
+                            if keep:
+                                produced.append(out)
+                            yield out
+        except BudgetExceeded:
+            raise
+        except Exception as e:
+            if not first:
+                raise
+            # Sin audio todavía: el modelo/SDK no soporta streaming → camino completo
+            logger.warning("TTS streaming no disponible (%s); se sintetiza completo.", e)
+            yield await self._synthesize(text)
+            return
+        pending += await run_audio(dec.flush)
+        if pending:
+            if keep:
+                produced.append(pending)
+            yield pending
+        if keep:
+            # frase corta completa: queda en memoria por si se repite en otra respuesta
+            await self.cache.put(text, self.voice, self.model, b"".join(produced), persist=False)
+
+    async def pipeline(self, text: str, lookahead: int = LOOKAHEAD,
+                       segments: Optional[List[str]] = None) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+        """
+        Audio de la respuesta por segmentos, en orden: (i, frames) mientras
+        suena el segmento i y (i, None) cuando terminó. Hasta `lookahead`
+        segmentos posteriores se sintetizan en paralelo; al cerrar el
+        generador (o cancelarlo) se cancela la síntesis pendiente.
+        Si el streaming de un segmento falla, el resto del segmento sale de
+        la síntesis completa; si esa también falla se lanza el error (el
+        llamador decide qué reproducir en lugar de lo que faltó).
+        `segments` permite pasar la partición ya hecha con split_segments().
+        """
+        if segments is None:
+            segments = split_segments(text)
+        queues: Dict[int, "asyncio.Queue[Any]"] = {}
+        tasks: Dict[int, "asyncio.Task[None]"] = {}
+        busy_at: Optional[int] = None
+
+        async def _produce(i: int) -> None:
+            nonlocal busy_at
+            q = queues[i]
+            sent = 0
+            try:
+                async for chunk in self.stream(segments[i]):
+                    sent += len(chunk)
+                    await q.put(chunk)
+            except asyncio.CancelledError:
+                raise
+            except BudgetExceeded as e:
+                # proceso saturado: se avisa con la frase en caché y se corta la respuesta
+                logger.warning("TTS segmento %d sin cupo: %s", i, e)
+                if busy_at is None or i < busy_at:
+                    busy_at = i
+                    audio = await self.busy_audio()
+                    if audio:
+                        await q.put(audio)
+            except Exception as e:
+                logger.warning("TTS segmento %d falló tras %d bytes (%s); se sintetiza completo.", i, sent, e)
+                try:
+                    audio = await self._synthesize(segments[i])
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e2:
+                    await q.put(e2)  # el consumidor lo relanza y corta la respuesta
+                    return
+                # μ-law es un byte por muestra: se salta lo que ya sonó (aproximado)
+                if audio[sent:]:
+                    await q.put(audio[sent:])
+            await q.put(None)
+
+        def _start(i: int) -> None:
+            if i < len(segments) and i not in tasks:
+                queues[i] = asyncio.Queue()
+                tasks[i] = asyncio.create_task(_produce(i))
+
+        try:
+            for i in range(min(len(segments), lookahead + 1)):
+                _start(i)
+            for i in range(len(segments)):
+                _start(i)
+                q = queues[i]
+                while True:
+                    chunk = await q.get()
+                    if chunk is None:
+                        break
+                    if isinstance(chunk, Exception):
+                        raise chunk
+                    yield i, chunk
+                yield i, None
+                tasks.pop(i, None)
+                queues.pop(i, None)
+                if busy_at is not None and i >= busy_at:
+                    break
+                if busy_at is None:
+                    _start(i + lookahead + 1)
+        finally:
+            for t in tasks.values():
+                t.cancel()
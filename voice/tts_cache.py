@@ -0,0 +1,185 @@
+"""
+Caché de frases TTS ya convertidas a μ-law 8 kHz.
+
+Clave: sha1(FORMAT_VERSION | modelo | voz | texto normalizado). Dos niveles:
+  - memoria: LRU acotada en bytes (VOICE_TTS_CACHE_MAX_BYTES)
+  - disco: un archivo .ulaw por frase en VOICE_TTS_CACHE_DIR (vacío = sin disco),
+    así un reinicio del proceso no vuelve a sintetizar el saludo. La lectura
+    y escritura de archivos corre en el pool de audio (voice/budget.py).
+
+FORMAT_VERSION identifica el audio guardado (códec, frecuencia y revisión de
+la conversión): al cambiar el códec o el resampler se sube y las entradas
+viejas del disco dejan de coincidir en lugar de seguir sonando.
+
+warm() sintetiza al arranque las frases fijas (saludo, fallback y
+VOICE_TTS_WARM_PHRASES, separadas por "|"). stats() expone aciertos por nivel.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+from .budget import run_audio
+
+logger = logging.getLogger("voice.tts_cache")
+
+CACHE_DIR = os.getenv("VOICE_TTS_CACHE_DIR", os.path.join(tempfile.gettempdir(), "voice_tts_cache"))
+MAX_BYTES = int(os.getenv("VOICE_TTS_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+# Solo frases cortas se guardan al vuelo (las respuestas largas casi nunca se repiten)
+MAX_CHARS = int(os.getenv("VOICE_TTS_CACHE_MAX_CHARS", "120"))
+WARM_PHRASES = [p.strip() for p in os.getenv("VOICE_TTS_WARM_PHRASES", "").split("|") if p.strip()]
+# códec - frecuencia - revisión de la conversión (g711 r2: segmento 0 corregido; rs1: resampler polifásico)
+FORMAT_VERSION = "ulaw-8000-g711r2-rs1"
+
+
+def _normalize(text: str) -> str:
+    return " ".join((text or "").split())
+
+
+class PhraseCache:
+    def __init__(self, cache_dir: Optional[str] = CACHE_DIR, max_bytes: int = MAX_BYTES, max_chars: int = MAX_CHARS):
+        self.cache_dir = cache_dir or None
+        self.max_bytes = max_bytes
+        self.max_chars = max_chars
+        self._mem: "OrderedDict[str, bytes]" = OrderedDict()
+        self._bytes = 0
+        self._inflight: Dict[str, "asyncio.Future[bytes]"] = {}
+        self.hits_mem = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self.evictions = 0
+        if self.cache_dir:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+            except Exception as e:
+                logger.warning("No se pudo crear VOICE_TTS_CACHE_DIR=%s (%s); caché solo en memoria.", self.cache_dir, e)
+                self.cache_dir = None
+
+    @staticmethod
+    def key(text: str, voice: str, model: str) -> str:
+        return hashlib.sha1(f"{FORMAT_VERSION}|{model}|{voice}|{_normalize(text)}".encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Optional[str]:
+        return os.path.join(self.cache_dir, f"{key}.ulaw") if self.cache_dir else None
+
+    def _remember(self, key: str, audio: bytes) -> None:
+        old = self._mem.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old)
+        if len(audio) > self.max_bytes:
+            return
+        self._mem[key] = audio
+        self._bytes += len(audio)
+        while self._bytes > self.max_bytes and self._mem:
+            _, dropped = self._mem.popitem(last=False)
+            self._bytes -= len(dropped)
+            self.evictions += 1
+
+    @staticmethod
+    def _read(path: str) -> Optional[bytes]:
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _write(path: str, audio: bytes) -> None:
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(audio)
+        os.replace(tmp, path)
+
+    async def get(self, text: str, voice: str, model: str) -> Optional[bytes]:
+        key = self.key(text, voice, model)
+        audio = self._mem.get(key)
+        if audio is not None:
+            self._mem.move_to_end(key)
+            self.hits_mem += 1
+            return audio
+        path = self._path(key)
+        if path:
+            try:
+                audio = await run_audio(self._read, path)
+            except Exception as e:
+                logger.warning("No se pudo leer %s: %s", path, e)
+            if audio:
+                self._remember(key, audio)
+                self.hits_disk += 1
+                return audio
+        self.misses += 1
+        return None
+
+    async def put(self, text: str, voice: str, model: str, audio: bytes, persist: bool = True) -> None:
+        if not audio:
+            return
+        key = self.key(text, voice, model)
+        self._remember(key, audio)
+        path = self._path(key)
+        if persist and path:
+            try:
+                await run_audio(self._write, path, audio)
+            except Exception as e:
+                logger.warning("No se pudo escribir %s: %s", path, e)
+
+    def cacheable(self, text: str) -> bool:
+        return 0 < len(_normalize(text)) <= self.max_chars
+
+    async def get_or_create(self, text: str, voice: str, model: str, create: Callable[[], Awaitable[bytes]]) -> bytes:
+        """Audio de la caché o de `create()`; llamadas simultáneas por la misma frase sintetizan una vez."""
+        audio = await self.get(text, voice, model)
+        if audio is not None:
+            return audio
+        key = self.key(text, voice, model)
+        # otra llamada pudo terminar la misma frase mientras se leía el disco
+        audio = self._mem.get(key)
+        if audio is not None:
+            return audio
+        fut = self._inflight.get(key)
+        if fut is not None:
+            return await asyncio.shield(fut)
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            audio = await create()
+            await self.put(text, voice, model, audio)
+            fut.set_result(audio)
+            return audio
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except Exception as e:
+            fut.set_exception(e)
+            fut.exception()  # marcado como recuperado aunque nadie más espere
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def warm(self, phrases: Iterable[str], voice: str, model: str, create: Callable[[str], Awaitable[bytes]]) -> int:
+        """Sintetiza (o carga de disco) las frases indicadas; devuelve cuántas quedaron listas."""
+        ready = 0
+        for text in dict.fromkeys(p for p in phrases if p and p.strip()):
+            try:
+                await self.get_or_create(text, voice, model, lambda t=text: create(t))
+                ready += 1
+            except Exception as e:
+                logger.warning("No se pudo precalentar la frase '%s': %s", text[:40], e)
+        return ready
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits_mem + self.hits_disk + self.misses
+        return {
+            "entries": len(self._mem),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits_mem": self.hits_mem,
+            "hits_disk": self.hits_disk,
+            "misses": self.misses,
+            "hit_rate": round((self.hits_mem + self.hits_disk) / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "disk_dir": self.cache_dir,
+        }
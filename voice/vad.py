@@ -0,0 +1,150 @@
+"""
+Detector de actividad de voz (VAD) por energía y cruces por cero, en streaming.
+
+Trabaja sobre PCM16 mono en frames de 20 ms:
+  - energía RMS en dBFS contra un piso de ruido adaptativo (baja rápido,
+    sube lento), más un umbral absoluto VOICE_VAD_MIN_DB
+  - tasa de cruces por cero: el ruido blanco/siseo cruza mucho más que la voz
+    sonora, así que no puede iniciar un turno (sí sostenerlo: fricativas)
+  - inicio: VOICE_VAD_MIN_SPEECH_MS de voz seguida (descarta clics y golpes)
+  - fin: VOICE_VAD_HANGOVER_MS de silencio seguido (no corta en pausas cortas)
+
+Probar offline contra una grabación μ-law 8 kHz (cruda, como la envía Twilio)
+o un WAV PCM16:
+
+    python -m voice.vad llamada.ulaw
+"""
+
+import math
+import os
+import sys
+import wave
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from . import g711
+
+FRAME_MS = 20
+MARGIN_DB = float(os.getenv("VOICE_VAD_MARGIN_DB", "10"))
+MIN_DB = float(os.getenv("VOICE_VAD_MIN_DB", "-45"))
+ZCR_MAX = float(os.getenv("VOICE_VAD_ZCR_MAX", "0.35"))
+MIN_SPEECH_MS = int(os.getenv("VOICE_VAD_MIN_SPEECH_MS", "120"))
+HANGOVER_MS = int(os.getenv("VOICE_VAD_HANGOVER_MS", "600"))
+
+# Adaptación del piso de ruido por frame (fracción del error)
+_FLOOR_DOWN = 0.30
+_FLOOR_UP = 0.02
+_FLOOR_UP_SPEECH = 0.002  # muy lento durante voz: absorbe un ruido constante nuevo
+
+
+class VoiceActivityDetector:
+    """Devuelve eventos ("start", t) / ("end", t) con t en segundos desde el inicio."""
+
+    def __init__(self, rate: int = 8000, margin_db: float = MARGIN_DB, min_db: float = MIN_DB,
+                 zcr_max: float = ZCR_MAX, min_speech_ms: int = MIN_SPEECH_MS, hangover_ms: int = HANGOVER_MS):
+        self.rate = rate
+        self.frame = rate * FRAME_MS // 1000
+        self.margin_db = margin_db
+        self.min_db = min_db
+        self.zcr_max = zcr_max
+        self.min_speech_frames = max(1, -(-min_speech_ms // FRAME_MS))
+        self.hangover_frames = max(1, -(-hangover_ms // FRAME_MS))
+        self.floor_db: Optional[float] = None
+        self.speaking = False
+        self._run = 0       # frames de voz seguidos (antes del inicio)
+        self._silent = 0    # frames de silencio seguidos (durante la voz)
+        self._frames = 0    # frames procesados
+        self._carry = np.empty(0, dtype=np.int16)
+
+    def _is_speech(self, x: np.ndarray) -> bool:
+        xf = x.astype(np.float32)
+        rms = float(np.sqrt(np.mean(xf * xf)))
+        db = 20 * math.log10(rms / 32768.0 + 1e-10)
+        zcr = float(np.count_nonzero(np.diff(np.signbit(x)))) / len(x)
+        if self.floor_db is None:
+            self.floor_db = db
+        above = db - self.floor_db
+        # frames con muchos cruces (siseo, fricativas) solo cuentan dentro de un turno ya iniciado
+        speech = db > self.min_db and above > self.margin_db and (zcr < self.zcr_max or self.speaking)
+        if db < self.floor_db:
+            rate = _FLOOR_DOWN
+        else:
+            rate = _FLOOR_UP_SPEECH if speech else _FLOOR_UP
+        self.floor_db += (db - self.floor_db) * rate
+        return speech
+
+    def process_array(self, x: np.ndarray) -> List[Tuple[str, float]]:
+        x = np.concatenate((self._carry, np.asarray(x, dtype=np.int16)))
+        n = len(x) - len(x) % self.frame
+        self._carry = x[n:]
+        events: List[Tuple[str, float]] = []
+        for off in range(0, n, self.frame):
+            speech = self._is_speech(x[off:off + self.frame])
+            self._frames += 1
+            t = self._frames * FRAME_MS / 1000.0
+            if not self.speaking:
+                self._run = self._run + 1 if speech else 0
+                if self._run >= self.min_speech_frames:
+                    self.speaking = True
+                    self._silent = 0
+                    events.append(("start", t))
+            else:
+                self._silent = 0 if speech else self._silent + 1
+                if self._silent >= self.hangover_frames:
+                    self.speaking = False
+                    self._run = 0
+                    events.append(("end", t))
+        return events
+
+    def process(self, pcm16: bytes) -> List[Tuple[str, float]]:
+        return self.process_array(np.frombuffer(pcm16, dtype="<i2", count=len(pcm16) // 2))
+
+    def process_mulaw(self, mulaw: bytes) -> List[Tuple[str, float]]:
+        return self.process_array(g711.decode_array(mulaw))
+
+    def onset_ms(self) -> int:
+        """Audio que ya pasó entre el inicio real de la voz y el evento "start"."""
+        return self.min_speech_frames * FRAME_MS
+
+
+# ------------------------------ CLI offline -----------------------------------
+
+def _load(path: str) -> Tuple[np.ndarray, int]:
+    if path.lower().endswith(".wav"):
+        with wave.open(path, "rb") as wf:
+            if wf.getsampwidth() != 2:
+                raise ValueError("WAV debe ser PCM16")
+            x = np.frombuffer(wf.readframes(wf.getnframes()), dtype="<i2")
+            if wf.getnchannels() == 2:
+                x = (x.reshape(-1, 2).astype(np.int32).sum(axis=1) // 2).astype(np.int16)
+            return x, wf.getframerate()
+    with open(path, "rb") as f:
+        return g711.decode_array(f.read()), 8000
+
+
+def main(argv: List[str]) -> int:
+    if not argv:
+        print("Uso: python -m voice.vad <grabación.ulaw|.wav>  (parámetros vía VOICE_VAD_*)")
+        return 2
+    x, rate = _load(argv[0])
+    vad = VoiceActivityDetector(rate=rate)
+    # en trozos de 20 ms, como llegan del WebSocket
+    step = vad.frame
+    start: Optional[float] = None
+    for off in range(0, len(x), step):
+        for ev, t in vad.process_array(x[off:off + step]):
+            if ev == "start":
+                start = t
+                print(f"{t:8.2f}s  inicio de voz")
+            else:
+                print(f"{t:8.2f}s  fin de voz   (turno de {t - (start or 0):.2f}s)")
+    total = len(x) / rate
+    if vad.speaking:
+        print(f"{total:8.2f}s  (audio termina con voz activa)")
+    print(f"duración {total:.2f}s, piso de ruido final {vad.floor_db or 0:.1f} dBFS")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
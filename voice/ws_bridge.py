@@ -1,4 +1,5 @@
-import os, json, base64, asyncio, struct, io, wave, html, time
+import os, json, base64, asyncio, html, time
+from collections import deque
 from typing import Optional, Any, Dict, cast, List
 from fastapi import FastAPI, WebSocket
 from insurance_agent.agent import root_agent
@@ -8,6 +9,17 @@ from dotenv import load_dotenv, find_dotenv
 from twilio.rest import Client as TwilioClient
 import logging
 
+from . import g711
+from .resample import StreamingResampler, resample
+from .tts import TtsEngine, split_segments
+from .tts_cache import PhraseCache, WARM_PHRASES
+from .budget import AGENT_BUDGET, TTS_BUDGET, BudgetExceeded
+from .vad import FRAME_MS, VoiceActivityDetector
+from .live_events import TranscriptAssembler
+from .outbound import MediaSender
+from .inbound import JitterBuffer, LiveUplink
+from .live_pool import LiveSessionManager
+
 load_dotenv(find_dotenv())
 
 app = FastAPI()
@@ -38,6 +50,16 @@ TWILIO_API_KEY_SID = os.environ.get("TWILIO_API_KEY_SID", "").strip()
 TWILIO_API_KEY_SECRET = os.environ.get("TWILIO_API_KEY_SECRET", "").strip()
 TWILIO_STREAM_WSS_URL = os.environ.get("TWILIO_STREAM_WSS_URL", "").strip()
 LOG_FRAMES_EVERY = int(os.environ.get("LOG_FRAMES_EVERY", "50").strip() or 50)
+# Tasa del audio que se envía al Live API (16 kHz es la nativa; 8000 = sin remuestrear)
+LIVE_INPUT_RATE = int(os.environ.get("LIVE_INPUT_RATE", "16000").strip() or 16000)
+# VAD propio (voice/vad.py): marca activity_start/activity_end en el Live API.
+# VOICE_VAD=false vuelve a la detección automática del Live API.
+VAD_ENABLED = os.environ.get("VOICE_VAD", "true").strip().lower() in ("1", "true", "yes")
+# Audio previo al evento "start" que se envía igual (el VAD confirma la voz tras unos
+# frames); nunca menos que VOICE_VAD_MIN_SPEECH_MS, para no perder el inicio de la frase
+VAD_PREROLL_MS = int(os.environ.get("VOICE_VAD_PREROLL_MS", "300").strip() or 300)
+# Barge-in: si el usuario habla mientras suena la respuesta, se corta el audio
+BARGE_IN_ENABLED = os.environ.get("VOICE_BARGE_IN", "true").strip().lower() in ("1", "true", "yes")
 
 # Memoria de conversación por llamada (callSid)
 CALL_MEMORY: Dict[str, List[Dict[str, str]]] = {}
@@ -45,171 +67,63 @@ CALL_MEMORY: Dict[str, List[Dict[str, str]]] = {}
 CALL_FLAGS: Dict[str, Dict[str, Any]] = {}
 
 # ------------------------ TTS: PCM24k → μ-law 8k -------------------------
-def _linear2ulaw(sample: int) -> int:
-    # basado en ITU G.711 μ-law
-    BIAS = 0x84
-    CLIP = 32635
-    sign = 0x80 if sample < 0 else 0x00
-    if sample < 0:
-        sample = -sample
-    if sample > CLIP:
-        sample = CLIP
-    sample = sample + BIAS
-    # calcular exponente
-    exponent = 7
-    mask = 0x4000
-    for exp in range(7, 0, -1):
-        if sample & mask:
-            exponent = exp
-            break
-        mask >>= 1
-    mantissa = (sample >> (exponent + 3)) & 0x0F
-    ulaw = ~(sign | (exponent << 4) | mantissa) & 0xFF
-    return ulaw
-
 def pcm16_to_mulaw(pcm16: bytes) -> bytes:
-    out = bytearray()
-    for (s,) in struct.iter_unpack('<h', pcm16):
-        out.append(_linear2ulaw(int(s)))
-    return bytes(out)
+    # Codificación por tabla (voice/g711.py)
+    return g711.encode(pcm16)
 
 def downsample_24k_to_8k(pcm16_24k: bytes) -> bytes:
-    # decimación simple: tomar 1 de cada 3 muestras (mono)
-    out = bytearray()
-    i = 0
-    data = pcm16_24k
-    n = len(data)
-    while i + 2 <= n:
-        # tomar muestra i (2 bytes little-endian)
-        out += data[i:i+2]
-        i += 6  # saltar 2 muestras
-    return bytes(out)
+    # FIR polifásico con anti-aliasing (voice/resample.py)
+    return resample(pcm16_24k, 24000, 8000)
+
+# Frases fijas: se sintetizan al arranque y se sirven desde la caché
+GREETING_TEXT = os.environ.get("VOICE_GREETING", "Hola, soy tu asesor virtual de seguros. ¿En qué puedo ayudarte hoy?")
+FALLBACK_REPLY = "Gracias. ¿Podrías repetir o darme más detalles?"
+# Se reproduce cuando el proceso no tiene cupo para el agente o el TTS (voice/budget.py)
+BUSY_REPLY = "Disculpa, en este momento tenemos mucha demanda. ¿Me lo repites en unos segundos?"
+
+# TTS de Gemini (voice/tts.py): stream() entrega audio conforme se genera
+TTS_CACHE = PhraseCache()
+TTS = TtsEngine(GENAI, TTS_MODEL, TTS_VOICE, cache=TTS_CACHE, busy_text=BUSY_REPLY)
+
+@app.on_event("startup")
+async def _warm_tts_cache():
+    async def _warm():
+        t0 = time.perf_counter()
+        n = await TTS.warm([GREETING_TEXT, FALLBACK_REPLY, BUSY_REPLY, *WARM_PHRASES])
+        logger.info("Caché TTS precalentada: %d frases en %.2fs", n, time.perf_counter() - t0)
+    # en segundo plano: el servidor acepta llamadas mientras tanto
+    asyncio.create_task(_warm())
+
+def _live_config() -> types.LiveConnectConfig:
+    # Transcripción del audio del usuario; con VAD propio se desactiva la detección automática
+    cfg: Dict[str, Any] = {"input_audio_transcription": types.AudioTranscriptionConfig()}
+    if VAD_ENABLED:
+        cfg["realtime_input_config"] = types.RealtimeInputConfig(
+            automatic_activity_detection=types.AutomaticActivityDetection(disabled=True)
+        )
+    return types.LiveConnectConfig(**cfg)
+
+# Sesiones Live: modelo recordado y pool pre-conectado (voice/live_pool.py)
+LIVE = LiveSessionManager(GENAI, LIVE_MODEL_CANDIDATES, _live_config)
+
+@app.on_event("startup")
+async def _start_live_pool():
+    LIVE.start()
+
+@app.on_event("shutdown")
+async def _close_live_pool():
+    await LIVE.close()
 
 # Conexión Live API se maneja como context manager en el handler
 async def tts_mulaw_8k(text: str) -> bytes:
-    # Solicita AUDIO y conviértelo a μ-law 8k para Twilio (detectando formato)
-    resp = GENAI.models.generate_content(
-        model=TTS_MODEL,
-        contents=text,
-        config=types.GenerateContentConfig(
-            response_modalities=["AUDIO"],
-            speech_config=types.SpeechConfig(
-                voice_config=types.VoiceConfig(
-                    prebuilt_voice_config=types.PrebuiltVoiceConfig(voice_name=TTS_VOICE)
-                )
-            ),
-        ),
-    )
-    # Extrae bytes de audio (inline_data) y su mime_type si está presente
-    try:
-        part = resp.candidates[0].content.parts[0]
-        blob = getattr(part, 'inline_data', None)  # type: ignore[attr-defined]
-        data = getattr(blob, 'data', None)
-        mime = getattr(blob, 'mime_type', None)
-    except Exception:
-        # fallback aproximado a otras formas
-        data, mime = getattr(resp, 'text', b''), None
-    if isinstance(data, str):
-        try:
-            data = base64.b64decode(data)
-        except Exception:
-            data = data.encode('utf-8')
-
-    raw = bytes(data or b"")
-    # Si es WAV, parsea cabecera y obtén PCM16 + sample rate real
-    pcm16: bytes
-    sr: int
-    if (mime or '').lower() in ("audio/wav", "audio/x-wav") or (raw[:4] == b'RIFF' and raw[8:12] == b'WAVE'):
-        with wave.open(io.BytesIO(raw), 'rb') as wf:
-            sr = wf.getframerate()
-            sampwidth = wf.getsampwidth()
-            nch = wf.getnchannels()
-            frames = wf.readframes(wf.getnframes())
-            # Requiere PCM16 mono; si no, intenta fallback simple
-            if sampwidth != 2:
-                # convertir a 16-bit truncando/extendiendo (simple y ruidoso, pero mejor que nada)
-                if sampwidth == 1:
-                    pcm16 = b''.join(struct.pack('<h', (b-128)<<8) for b in frames)
-                else:
-                    # si 24-bit, toma los 2 bytes menos significativos (asumiendo 3 bytes por muestra)
-                    pcm16 = bytearray()
-                    for i in range(0, len(frames), 3):
-                        # tomar low y mid byte
-                        if i+2 <= len(frames):
-                            pcm16 += frames[i:i+2]
-                    pcm16 = bytes(pcm16)
-            else:
-                pcm16 = frames
-            if nch == 2:
-                # mezclar a mono promediando canales (simple, sin audioop)
-                mono = bytearray()
-                it = struct.iter_unpack('<hh', pcm16)
-                for (l, r) in it:
-                    m = (l + r) // 2
-                    mono += struct.pack('<h', m)
-                pcm16 = bytes(mono)
-    else:
-        # Asumimos PCM lineal 16-bit LE a 24000 Hz por defecto de TTS
-        pcm16 = raw
-        sr = 24000
-
-    # Downsample genérico a 8000 Hz (decimación si múltiplo, si no, interpolación lineal)
-    def downsample_to_8k(pcm: bytes, src_hz: int) -> bytes:
-        if src_hz == 8000:
-            return pcm
-        if src_hz % 8000 == 0:
-            factor = src_hz // 8000
-            out = bytearray()
-            i = 0
-            n = len(pcm)
-            step = 2 * factor
-            while i + 2 <= n:
-                out += pcm[i:i+2]
-                i += step
-            return bytes(out)
-    # Interpolación lineal simple
-        samples = [s for (s,) in struct.iter_unpack('<h', pcm)]
-        out = bytearray()
-        ratio = src_hz / 8000.0
-        out_len = int(len(samples) / ratio)
-        for i in range(out_len):
-            src_pos = i * ratio
-            j = int(src_pos)
-            a = samples[j]
-            b = samples[j+1] if j+1 < len(samples) else a
-            t = src_pos - j
-            val = int(a + (b - a) * t)
-            out += struct.pack('<h', val)
-        return bytes(out)
-
-    pcm8k = downsample_to_8k(pcm16, sr)
-    return pcm16_to_mulaw(pcm8k)
-
-BIAS = 0x84  # 132
-def _mulaw_byte_to_linear(b: int) -> int:
-    u = (~b) & 0xFF
-    sign = u & 0x80
-    exponent = (u >> 4) & 0x07
-    mantissa = u & 0x0F
-    t = ((mantissa << 3) + BIAS) << exponent
-    sample = t - BIAS
-    return -sample if sign else sample
+    # Audio completo en μ-law 8k para Twilio (camino no-streaming)
+    return await TTS.synthesize(text)
 
 def decode_mulaw_to_pcm16(mulaw: bytes) -> bytes:
-    out = bytearray()
-    for b in mulaw:
-        s = _mulaw_byte_to_linear(b)
-        out += struct.pack('<h', max(-32768, min(32767, s)))
-    return bytes(out)
+    return g711.decode(mulaw)
 
 def upsample_8k_to_16k(pcm16_8k: bytes) -> bytes:
-    # Duplicación simple de muestras (zero-order hold) 8k → 16k
-    out = bytearray()
-    it = struct.iter_unpack('<h', pcm16_8k)
-    for (s,) in it:
-        out += struct.pack('<h', s)
-        out += struct.pack('<h', s)
-    return bytes(out)
+    return resample(pcm16_8k, 8000, 16000)
 
 @app.websocket("/voice-stream")
 async def voice_stream(ws: WebSocket):
@@ -224,9 +138,25 @@ async def voice_stream(ws: WebSocket):
     events_q: asyncio.Queue[Dict[str, Any]] = asyncio.Queue()
     pump_task: Optional[asyncio.Task[Any]] = None
     responder_task: Optional[asyncio.Task[Any]] = None
-    last_media_ts: float | None = None
     frame_count: int = 0
     total_rx_bytes: int = 0
+    # Remuestreo 8k → LIVE_INPUT_RATE con estado (sin artefactos entre frames)
+    asr_resampler = StreamingResampler(8000, LIVE_INPUT_RATE)
+    # Fin de turno por VAD sobre el audio entrante (no por huecos entre frames)
+    vad = VoiceActivityDetector(8000)
+    # el pre-roll cubre al menos lo que el VAD tarda en confirmar la voz (más un frame)
+    preroll: deque[bytes] = deque(maxlen=max(VAD_PREROLL_MS, vad.onset_ms() + FRAME_MS) // FRAME_MS)
+    transcripts = TranscriptAssembler()
+    # Reproducción en curso: segmentos del turno, último segmento confirmado por
+    # Twilio (mark de vuelta) y la entrada de memoria de la respuesta
+    play_task: Optional[asyncio.Task[Any]] = None
+    playback: Optional[Dict[str, Any]] = None
+    # Audio saliente a ritmo de reproducción (se crea con el streamSid en "start")
+    sender: Optional[MediaSender] = None
+    # Entrada: orden por número de chunk y paquetes de VOICE_IN_PACKET_MS hacia el Live
+    jitter = JitterBuffer()
+    uplink: Optional[LiveUplink] = None
+    live_ok = False  # la sesión Live ya aceptó un envío
     # Helper: construir prompt con historial
     def _build_agent_input(user_text: str, sid: Optional[str]) -> str:
         turns = CALL_MEMORY.get(sid or "", [])
@@ -294,23 +224,44 @@ async def voice_stream(ws: WebSocket):
         await asyncio.to_thread(_update)
 
     try:
-        last_err = None
-        for candidate in LIVE_MODEL_CANDIDATES:
+        t_live = time.perf_counter()
+        lease = await LIVE.acquire()
+        live_cm, live, chosen_model = lease.cm, lease.session, lease.model
+        logger.info("Conectado a Live model: %s en %.3fs (pre-conectada=%s, TTS_MODE=%s, TWILIO_VOICE=%s)",
+                    chosen_model, time.perf_counter() - t_live, lease.pooled, TWILIO_TTS_MODE, TWILIO_VOICE)
+
+        async def _live_send_once(kind: str, pcm: bytes):
+            if kind == "audio":
+                blob = types.Blob(data=pcm, mime_type=f"audio/pcm;rate={LIVE_INPUT_RATE}")
+                await live.send(input=types.LiveClientRealtimeInput(audio=blob))
+            elif kind == "start":
+                await live.send(input=types.LiveClientRealtimeInput(activity_start=types.ActivityStart()))
+            else:
+                await live.send(input=types.LiveClientRealtimeInput(activity_end=types.ActivityEnd()))
+
+        async def _live_send(kind: str, pcm: bytes):
+            nonlocal lease, live_cm, live, chosen_model, pump_task, live_ok
             try:
-                logger.info("Intentando Live model: %s", candidate)
-                live_cm = GENAI.aio.live.connect(model=candidate)
-                live = await live_cm.__aenter__()
-                chosen_model = candidate
-                logger.info("Conectado a Live model: %s (TTS_MODE=%s, TWILIO_VOICE=%s)", candidate, TWILIO_TTS_MODE, TWILIO_VOICE)
-                break
+                await _live_send_once(kind, pcm)
             except Exception as e:
-                last_err = e
-                logger.warning("Fallo conectando con %s: %s", candidate, str(e))
-                live_cm = None
-                live = None
-                continue
-        if not live:
-            raise RuntimeError(f"No se pudo abrir Live con ninguno de: {', '.join(LIVE_MODEL_CANDIDATES)}; ultimo error: {last_err}")
+                if live_ok or not lease.pooled:
+                    raise
+                # la sesión pre-conectada ya estaba cerrada del lado del servidor: otra y se reintenta
+                logger.warning("Sesión Live del pool caída (%s, edad %.0fs); se reconecta.", e, lease.age)
+                lease = await LIVE.replace(lease)
+                live_cm, live, chosen_model = lease.cm, lease.session, lease.model
+                if pump_task is not None:
+                    pump_task.cancel()
+                    pump_task = asyncio.create_task(_pump_events())
+                await _live_send_once(kind, pcm)
+            live_ok = True
+
+        uplink = LiveUplink(_live_send, LIVE_INPUT_RATE)
+        uplink.start()
+
+        async def _put_event(ev: Any):
+            for e in transcripts.feed(ev):
+                await events_q.put(e)
 
         # Arranca un pump de eventos si es posible
         async def _pump_events():
@@ -324,21 +275,21 @@ async def voice_stream(ws: WebSocket):
                         # Si devuelve un async generator, iteramos sobre él
                         if hasattr(agen, '__aiter__'):
                             async for ev in agen:
-                                await events_q.put(ev)
+                                await _put_event(ev)
                         else:
                             # Si fuese un awaitable que entrega un evento, caemos a bucle
                             while True:
                                 ev = await agen
-                                await events_q.put(ev)
+                                await _put_event(ev)
                     except TypeError:
                         # Versión que requiere await recv() cada vez
                         while True:
                             ev = await recv()
-                            await events_q.put(ev)
+                            await _put_event(ev)
                 elif hasattr(live, "__aiter__"):
                     logger.info("Live session es async-iterable; iniciando pump de eventos.")
                     async for ev in live:
-                        await events_q.put(ev)
+                        await _put_event(ev)
                 else:
                     logger.warning("La sesión Live no expone receive()/iter; no se podrá leer eventos.")
             except Exception as e:
@@ -348,10 +299,71 @@ async def voice_stream(ws: WebSocket):
         if callable(getattr(live, "receive", None)) or hasattr(live, "__aiter__"):
             pump_task = asyncio.create_task(_pump_events())
 
+        async def _play(reply: str, turn: int, segments: List[str]):
+            # TTS μ-law 8k por oraciones: la primera suena mientras se sintetizan
+            # las siguientes; el sender marca cada segmento y pacea el envío
+            if sender is None:
+                return
+            entry = playback["memory"] if playback is not None and playback["turn"] == turn else None
+            done = -1
+            try:
+                async for seg, ulaw8k in TTS.pipeline(reply, segments=segments):
+                    if ulaw8k is None:
+                        sender.mark(f"seg-{turn}-{seg}")
+                        done = seg
+                    else:
+                        sender.send_audio(ulaw8k)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # sin audio para el resto de la respuesta: se avisa y se corrige la memoria
+                logger.warning("TTS falló en el segmento %d/%d (%s); se reproduce el fallback.", done + 2, len(segments), e)
+                try:
+                    sender.send_audio(await TTS.synthesize(FALLBACK_REPLY))
+                except Exception as fe:
+                    logger.warning("Tampoco se pudo reproducir el fallback: %s", fe)
+                if entry is not None:
+                    spoken = " ".join(segments[:done + 1])
+                    entry["text"] = (f"{spoken} " if spoken else "") + f"[error de voz; no escuchó el resto, se le dijo: {FALLBACK_REPLY}]"
+            sender.mark(f"resp_done-{turn}", last=True)
+            await sender.drain()
+
+        def _on_mark(name: str):
+            # Twilio devuelve cada mark cuando el audio anterior terminó de sonar
+            if playback is None or playback["done"]:
+                return
+            turn = playback["turn"]
+            if name == f"resp_done-{turn}":
+                playback["done"] = True
+            elif name.startswith(f"seg-{turn}-"):
+                playback["played"] = max(playback["played"], int(name.rsplit("-", 1)[1]))
+
+        async def _barge_in(t: float):
+            nonlocal playback
+            if playback is None or playback["done"]:
+                # audio fuera de una respuesta (el saludo): se corta igual, sin memoria que corregir
+                if sender is not None and sender.queued_ms + sender.buffered_ms > 0:
+                    dropped_ms = await sender.clear()
+                    logger.info("Barge-in t=%.2fs: saludo cortado (%d ms descartados)", t, dropped_ms)
+                return
+            playback["done"] = True  # los marks que Twilio devuelva tras "clear" ya no cuentan
+            if play_task and not play_task.done():
+                play_task.cancel()  # corta la síntesis pendiente
+            dropped_ms = await sender.clear() if sender else 0  # cola local + buffer de Twilio
+            segments = playback["segments"]
+            heard = " ".join(segments[:playback["played"] + 1])
+            missed = " ".join(segments[playback["played"] + 1:])
+            logger.info("Barge-in t=%.2fs: turno %d cortado tras %d/%d segmentos (%d ms descartados)",
+                        t, playback["turn"], playback["played"] + 1, len(segments), dropped_ms)
+            entry = playback.get("memory")
+            if entry is not None and missed:
+                entry["text"] = (f"{heard} " if heard else "") + f"[interrumpido por el usuario; no escuchó: {missed}]"
+
         # Task: responder cuando detectemos texto final del usuario
         async def _responder():
-            nonlocal stream_sid, call_sid
+            nonlocal stream_sid, call_sid, play_task, playback
             logged = 0
+            turn = 0
             while True:
                 e: Dict[str, Any] = await events_q.get()
                 try:
@@ -379,14 +391,21 @@ async def voice_stream(ws: WebSocket):
                             CALL_MEMORY.setdefault(call_sid, []).append({"role": "user", "text": user_text})
                         agent_input = _build_agent_input(user_text, call_sid)
                         t0 = time.perf_counter()
-                        agent_res = await root_agent.run_async(agent_input)
+                        try:
+                            async with AGENT_BUDGET.slot():
+                                agent_res = await root_agent.run_async(agent_input)
+                            reply = getattr(agent_res, "output_text", "") or FALLBACK_REPLY
+                        except BudgetExceeded as bex:
+                            logger.warning("Agente sin cupo (%s); se responde con frase de espera.", bex)
+                            reply = BUSY_REPLY
                         t1 = time.perf_counter()
-                        reply = getattr(agent_res, "output_text", "") or "Gracias. ¿Podrías repetir o darme más detalles?"
                         logger.info("Agente respondió en %.3fs (len=%d)", t1 - t0, len(reply))
 
                         # Guardar turno del asistente
+                        memory_entry: Optional[Dict[str, str]] = None
                         if call_sid:
-                            CALL_MEMORY.setdefault(call_sid, []).append({"role": "assistant", "text": reply})
+                            memory_entry = {"role": "assistant", "text": reply}
+                            CALL_MEMORY.setdefault(call_sid, []).append(memory_entry)
 
                         # Si se configura TTS nativo de Twilio, hacemos redirect con <Say> y reconectamos <Stream>
                         if TWILIO_TTS_MODE == "twilio":
@@ -402,20 +421,15 @@ async def voice_stream(ws: WebSocket):
                             except Exception as tex:
                                 logger.warning("Fallo TTS Twilio (%s), fallback a Gemini TTS.", tex)
 
-                        # TTS μ-law 8k en frames de 20ms
-                        ulaw8k = await tts_mulaw_8k(reply)
-                        frame = 160
-                        for pos in range(0, len(ulaw8k), frame):
-                            chunk = ulaw8k[pos:pos+frame]
-                            await ws.send_text(json.dumps({
-                                "event":"media","streamSid":stream_sid,
-                                "media":{"payload": base64.b64encode(chunk).decode()}
-                            }))
-                            await asyncio.sleep(0)
-                        await ws.send_text(json.dumps({
-                            "event":"mark","streamSid":stream_sid,
-                            "mark":{"name":"resp_done"}
-                        }))
+                        # Reproducción en una task aparte: el barge-in la cancela
+                        turn += 1
+                        segments = split_segments(reply)
+                        playback = {"turn": turn, "segments": segments, "played": -1,
+                                    "done": False, "memory": memory_entry}
+                        play_task = asyncio.create_task(_play(reply, turn, segments))
+                        await asyncio.wait({play_task})
+                        if not play_task.cancelled() and play_task.exception():
+                            logger.warning("Reproducción falló: %s", play_task.exception())
                     else:
                         logger.debug("Evento Live sin texto final utilizable: %s", et)
                 except Exception as ex:
@@ -430,6 +444,9 @@ async def voice_stream(ws: WebSocket):
 
             if ev == "start":
                 stream_sid = data["start"]["streamSid"]
+                if sender is None:
+                    sender = MediaSender(ws.send_text, stream_sid)
+                    sender.start()
                 call_sid = data["start"].get("callSid") or data["start"].get("call_sid")
                 account_sid_ws = data["start"].get("accountSid") or data["start"].get("account_sid")
                 logger.info("Stream started: %s callSid=%s accountSid=%s (live model=%s)", stream_sid, call_sid, account_sid_ws, chosen_model)
@@ -437,13 +454,9 @@ async def voice_stream(ws: WebSocket):
                     logger.info("Turnos en memoria para callSid=%s: %d", call_sid, len(CALL_MEMORY.get(call_sid, [])))
                 # Saludo inicial (solo una vez por callSid)
                 try:
-                    greeting = "Hola, soy tu asesor virtual de seguros. ¿En qué puedo ayudarte hoy?"
+                    greeting = GREETING_TEXT
                     already_greeted = bool(call_sid and CALL_FLAGS.get(call_sid, {}).get("greeted"))
                     if TWILIO_TTS_MODE == "twilio" and not already_greeted:
-                        try:
-                            await live.send(input=types.LiveClientRealtimeInput(activity_start=types.ActivityStart()))
-                        except Exception:
-                            pass
                         try:
                             await _twilio_say_and_restream(greeting)
                             if call_sid:
@@ -452,22 +465,14 @@ async def voice_stream(ws: WebSocket):
                             # Si falla autenticación o permisos, hacemos fallback inmediato a Gemini TTS para no dejar silencio
                             logger.warning("No se pudo enviar saludo con Twilio (<Say>): %s. Fallback a Gemini TTS.", tex)
                             ulaw_greet = await tts_mulaw_8k(greeting)
-                            await ws.send_text(json.dumps({
-                                "event":"media","streamSid":stream_sid,
-                                "media":{"payload": base64.b64encode(ulaw_greet).decode()}
-                            }))
+                            sender.send_audio(ulaw_greet)
+                            sender.mark("greeting", last=True)
                             if call_sid:
                                 CALL_FLAGS.setdefault(call_sid, {})["greeted"] = True
                     elif TWILIO_TTS_MODE != "twilio" and not already_greeted:
                         ulaw_greet = await tts_mulaw_8k(greeting)
-                        await ws.send_text(json.dumps({
-                            "event":"media","streamSid":stream_sid,
-                            "media":{"payload": base64.b64encode(ulaw_greet).decode()}
-                        }))
-                        try:
-                            await live.send(input=types.LiveClientRealtimeInput(activity_start=types.ActivityStart()))
-                        except Exception as e:
-                            logger.debug("No se pudo enviar activity_start: %s", e)
+                        sender.send_audio(ulaw_greet)
+                        sender.mark("greeting", last=True)
                         if call_sid:
                             CALL_FLAGS.setdefault(call_sid, {})["greeted"] = True
                     else:
@@ -477,29 +482,51 @@ async def voice_stream(ws: WebSocket):
                 continue
 
             if ev == "media":
-                # Twilio → μ-law 8k base64 → bytes → PCM16 8k (sin cambiar frecuencia)
+                # Twilio → μ-law 8k base64 → bytes → PCM16 8k → PCM16 a LIVE_INPUT_RATE
                 mulaw = base64.b64decode(data["media"]["payload"])
                 total_rx_bytes += len(mulaw)
                 frame_count += 1
                 if frame_count % LOG_FRAMES_EVERY == 0:
                     logger.info("Frames recibidos: %d  bytes(mu-law): %d", frame_count, total_rx_bytes)
-                pcm16_8k = decode_mulaw_to_pcm16(mulaw)
-                # Enviar audio PCM16 8k directo a la sesión Live (sin upsample)
-                blob = types.Blob(data=pcm16_8k, mime_type="audio/pcm;rate=8000")
-                await live.send(input=types.LiveClientRealtimeInput(audio=blob))
+                # Orden por media.chunk (contador propio de los frames de audio; el
+                # sequenceNumber global también cuenta marks y otros eventos, sus
+                # saltos se rellenarían con silencio): sin chunk, pasa tal cual llega
+                seq = (data.get("media") or {}).get("chunk")
+                frames = jitter.push(int(seq), mulaw) if seq is not None else [mulaw]
+                for mulaw in frames:
+                    pcm16_8k = decode_mulaw_to_pcm16(mulaw)
+                    pcm_live = asr_resampler.process(pcm16_8k)
+                    vad_events = vad.process(pcm16_8k)
+                    if BARGE_IN_ENABLED:
+                        for vad_ev, vad_t in vad_events:
+                            if vad_ev == "start":
+                                await _barge_in(vad_t)
+                    if not VAD_ENABLED:
+                        await uplink.audio(pcm_live)
+                        continue
 
-                # Heurística: si hubo una pausa larga entre frames, marca fin de segmento de audio
-                now = asyncio.get_event_loop().time()
-                if last_media_ts is not None and (now - last_media_ts) > 0.8:
-                    try:
-                        await live.send(input=types.LiveClientRealtimeInput(audio_stream_end=True, activity_end=types.ActivityEnd()), end_of_turn=True)
-                        logger.info("Detectada pausa larga; enviado end_of_turn al Live API")
-                    except Exception as e:
-                        logger.debug("Error enviando audio_stream_end: %s", e)
-                last_media_ts = now
+                    for vad_ev, vad_t in vad_events:
+                        if vad_ev == "start":
+                            logger.info("VAD inicio de voz t=%.2fs", vad_t)
+                            await uplink.activity_start(b"".join(preroll))
+                            preroll.clear()
+                        else:
+                            logger.info("VAD fin de voz t=%.2fs; enviado activity_end al Live API", vad_t)
+                            await uplink.activity_end()
+                    if vad.speaking:
+                        await uplink.audio(pcm_live)
+                    else:
+                        # silencio: no se envía, solo se guarda para el inicio del próximo turno
+                        preroll.append(pcm_live)
+                continue
+
+            if ev == "mark":
+                _on_mark((data.get("mark") or {}).get("name", ""))
+                continue
 
             if ev == "stop":
-                logger.info("Stream stopped: %s  frames=%d  bytes=%d", stream_sid, frame_count, total_rx_bytes)
+                logger.info("Stream stopped: %s  frames=%d  bytes=%d  entrada=%s %s  salida=%s", stream_sid, frame_count,
+                            total_rx_bytes, jitter.stats(), uplink.stats() if uplink else {}, sender.stats() if sender else {})
                 break
     finally:
         try:
@@ -516,12 +543,30 @@ async def voice_stream(ws: WebSocket):
                     responder_task.cancel()
                 except Exception:
                     pass
+            if play_task:
+                play_task.cancel()
+            if sender:
+                await sender.close()
+            if uplink:
+                await uplink.close()
             await ws.close()
 
 @app.get("/health")
 async def health():
     return {"status":"ok"}
 
+@app.get("/tts-cache")
+async def tts_cache_stats():
+    return TTS_CACHE.stats()
+
+@app.get("/voice-load")
+async def voice_load():
+    return {"tts": TTS_BUDGET.stats(), "agent": AGENT_BUDGET.stats()}
+
+@app.get("/live-pool")
+async def live_pool_stats():
+    return LIVE.stats()
+
 @app.get("/live-models")
 async def list_live_models():
     try:
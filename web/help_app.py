@@ -60,23 +60,33 @@ def _parse_events(events: list) -> str:
     if isinstance(events, list):
         for ev in events:
             content = ev.get("content") or {}
-            for part in content.get("parts") or []:
-                t = part.get("text")
-                if t:
-                    out.append(t)
-    return "".join(out).strip()
+            texts = [part.get("text") for part in content.get("parts") or [] if part.get("text")]
+            if texts:
+                out.append("".join(texts).strip())
+    # cada evento es un mensaje (p. ej. aviso urgente + continuación del modelo)
+    return "\n\n".join(t for t in out if t).strip()
 
-def run_once(text: str) -> str:
-    url = f"{BASE_URL}/run"
+def run_stream(text: str):
+    """Itera el texto acumulado conforme llegan eventos (SSE), p. ej. el aviso urgente primero."""
+    url = f"{BASE_URL}/run_sse"
     payload = {
         "app_name": APP_NAME,
         "user_id": USER_ID,
         "session_id": session_id,
         "new_message": {"role": "user", "parts": [{"text": text}]},
+        "streaming": False,
     }
-    r = requests.post(url, json=payload, headers=_headers(), timeout=120)
-    r.raise_for_status()
-    return _parse_events(r.json())
+    events = []
+    with requests.post(url, json=payload, headers=_headers(sse=True), stream=True, timeout=120) as r:
+        r.raise_for_status()
+        for line in r.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue
+            try:
+                events.append(json.loads(line[5:].strip()))
+            except ValueError:
+                continue
+            yield _parse_events(events)
 
 # --------------- Chat ---------------
 prompt = st.chat_input("Escribe tu mensaje")
@@ -87,11 +97,15 @@ if prompt:
         st.markdown(prompt)
 
     with st.chat_message("assistant"):
+        placeholder = st.empty()
+        out = ""
         try:
-            out = run_once(prompt)
+            for out in run_stream(prompt):
+                if out:
+                    placeholder.markdown(out)
         except requests.HTTPError as e:
             out = f"HTTP {e.response.status_code}: {e.response.text}"
         except Exception as e:
             out = str(e)
-        st.markdown(out or "(sin texto)")
+        placeholder.markdown(out or "(sin texto)")
         st.session_state.history.append(("assistant", out or ""))